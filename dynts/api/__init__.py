@@ -3,7 +3,7 @@ from .names import tsname
 from .timeseries import TimeSeries, is_timeseries, ts_bin_op
 from .scatter import Scatter, is_scatter
 from .main import timeseries, randomts
-from ..dsl import parse, evaluate
+from ..dsl import parse, evaluate, evaluate_many
 from .. import backends     # noqa
 
 
@@ -18,5 +18,6 @@ __all__ = [
     'randomts',
     'ts_bin_op',
     'parse',
-    'evaluate'
+    'evaluate',
+    'evaluate_many'
 ]
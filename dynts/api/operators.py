@@ -1,6 +1,7 @@
 import numpy as np
 
 from ..exc import ExpressionError
+from ..utils.section import asarray
 
 
 _ops = {
@@ -11,6 +12,14 @@ _ops = {
 }
 
 
+_ufuncs = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'div': np.true_divide,
+}
+
+
 def op_get(op_name):
     global _ops
     op = _ops.get(op_name, None)
@@ -78,54 +87,104 @@ def _create_fill_vec(ts, fill_fn):
     return fill
 
 
-def op_scalar_ts(op_name, op, scalar, ts, fill_fn):
-    fill_vec = _create_fill_vec(ts, fill_fn)
-    values = ts.values()
-    shape = values.shape
-    v2 = _toVec(shape, scalar)
+def op_scalar_ts(op_name, op, scalar, ts, fill_fn, inplace=False):
+    '''Apply *op* to *scalar* and the values of *ts*.
+    Check :func:`op_ts_scalar`.'''
+    return None, _broadcast(op_name, op, ts, scalar, True, inplace)
 
-    dts = ts.dates()
-    result = applyfn(op, v2, values, fill_vec)
-    return dts, result
 
+def op_ts_scalar(op_name, op, ts, scalar, fill_fn, inplace=False):
+    '''Apply *op* to the values of *ts* and *scalar* with a single
+    broadcasting ufunc call.
 
-def op_ts_scalar(op_name, op, ts, scalar, fill_fn):
-    values = ts.values()
-    if values is not None:
-        fill_vec = _create_fill_vec(ts, fill_fn)
-        shape = values.shape
-        v2 = _toVec(shape, scalar)
-        dts = ts.dates()
-        result = applyfn(op, values, v2, fill_vec)
-        return dts, result
+    If *inplace* is ``True`` the values of *ts* are overwritten with the
+    result, when the type of the result allows it.
+    Return a two-elements tuple with ``None``, the result has the same
+    dates as *ts*, and the values.
+    '''
+    return None, _broadcast(op_name, op, ts, scalar, False, inplace)
+
+
+def _broadcast(op_name, op, ts, scalar, reverse, inplace):
+    values = _values(ts)
+    args = (scalar, values) if reverse else (values, scalar)
+    ufunc = _ufuncs.get(op_name)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if ufunc is None:
+            return op(*args)
+        out = None
+        if inplace and not ts.isshared():
+            # the output type of the ufunc, e.g. true_divide of integers
+            # is always a float
+            empty = (scalar, values[:0]) if reverse else (values[:0], scalar)
+            if ufunc(*empty).dtype == values.dtype:
+                out = values
+        return ufunc(*args, out=out)
+
+
+def join_index(dates1, dates2, all=True):
+    '''Align two sorted arrays of unique dates.
+
+    Return a three-elements tuple ``(dates, index1, index2)`` where
+    ``dates`` is the union (if *all* is ``True``) or the intersection of the
+    two arrays, and ``index1``, ``index2`` are integer arrays with the
+    position of each date in *dates1* and *dates2*, ``-1`` when missing.
+    If the two arrays are identical ``(dates1, None, None)`` is returned.
+    '''
+    dates1 = asarray(dates1)
+    dates2 = asarray(dates2)
+    if dates1 is dates2 or (len(dates1) == len(dates2) and
+                            np.array_equal(dates1, dates2)):
+        return dates1, None, None
+    if all:
+        dates = np.union1d(dates1, dates2)
+    else:
+        dates = np.intersect1d(dates1, dates2, assume_unique=True)
+    return dates, _positions(dates1, dates), _positions(dates2, dates)
+
+
+def _positions(dates, keys):
+    index = np.searchsorted(dates, keys)
+    if len(dates):
+        found = dates[np.minimum(index, len(dates) - 1)] == keys
     else:
-        return None, None
+        found = np.zeros(len(keys), dtype=bool)
+    return np.where(found, index, -1)
 
 
 def op_ts_ts(op_name, op, ts, ts2, all, fill_fn):
+    '''Apply *op* to two timeseries aligned by date.
+
+    Dates missing from either timeseries are filled with ``fill_fn()``
+    when *all* is ``True``, dropped otherwise.
+    Return a two-elements tuple with dates and values. Dates are ``None``
+    when the two timeseries have the same dates.
+    '''
     if ts.count() != ts2.count():
         raise ExpressionError(
             "Cannot %s two timeseries with different number of series."
             % op_name
         )
-    dts1 = set(ts.dates())
-    if all:
-        indx = dts1.union(ts2.dates())
-    else:
-        indx = dts1.intersection(ts2.dates())
-    hash = ts.ashash()
-    hash2 = ts2.ashash()
-
-    fill = _create_fill_vec(ts, fill_fn)
-    # fill = np.array([fill_fn()])
-    for dt in indx:
-        v = hash.get(dt, None)
-        v2 = hash2.get(dt, None)
-        if v is None or v2 is None:
-            v = fill
-        else:
-            v = op(v, v2)
-        hash[dt] = v
-    new_ts = hash.getts()
-    rt = zip(*new_ts.items())
-    return rt
+    dates, index1, index2 = join_index(ts.keys(), ts2.keys(), all)
+    values1 = _values(ts)
+    values2 = _values(ts2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if index1 is None:
+            return None, op(values1, values2)
+        both = (index1 >= 0) & (index2 >= 0)
+        values = op(values1[index1[both]], values2[index2[both]])
+    if both.all():
+        return dates, values
+    fill = fill_fn()
+    dtype = np.promote_types(values.dtype, np.asarray(fill).dtype)
+    data = np.empty((len(dates), ts.count()), dtype=dtype)
+    data.fill(fill)
+    data[both] = values
+    return dates, data
+
+
+def _values(ts):
+    values = ts.values()
+    if not len(values):
+        return np.empty((0, ts.count()), dtype=ts.dtype)
+    return asarray(values)
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 from ..conf import settings
@@ -6,22 +8,45 @@ from .. import lib
 
 
 def rollsingle(self, func, window=20, name=None, fallback=False,
-               align='right', **kwargs):
-    '''Efficient rolling window calculation for min, max type functions
+               align='right', threads=None, **kwargs):
+    '''Efficient rolling window calculation for min, max type functions.
+    All columns are rolled by a single call to the two-dimensional kernel
+    ``roll2d_<func>``, or by one call per block of columns if *threads* is
+    greater than one. Additional keyword arguments, such as ``scale`` and
+    ``ddof`` for ``sd``, are passed to the kernel.
     '''
-    rname = 'roll_{0}'.format(func)
-    if fallback:
-        rfunc = getattr(lib.fallback, rname)
-    else:
-        rfunc = getattr(lib, rname, None)
-        if not rfunc:
-            rfunc = getattr(lib.fallback, rname)
-    data = np.array([list(rfunc(serie, window)) for serie in self.series()])
+    rfunc = lib.kernel('roll2d_{0}'.format(func), fallback)
+    data = rollcolumns(rfunc, np.asarray(self.values(), dtype=float),
+                       window, threads, **kwargs)
     name = name or self.makename(func, window=window)
-    dates = asarray(self.dates())
+    dates = asarray(self.keys())
     desc = settings.desc
     if (align == 'right' and not desc) or desc:
         dates = dates[window-1:]
     else:
         dates = dates[:-window+1]
-    return self.clone(dates, data.transpose(), name=name)
+    return self.clone(dates, data, name=name)
+
+
+def rollcolumns(rfunc, values, window, threads=None, **kwargs):
+    '''Apply the two-dimensional rolling kernel *rfunc* to *values*.
+    If *threads* is greater than one, columns are split into *threads*
+    contiguous blocks which are rolled concurrently by a thread pool.
+    Kernels from the ``cts`` extension release the GIL while rolling.
+    '''
+    N, K = values.shape
+    threads = min(threads or 1, K)
+    if threads < 2:
+        return rfunc(values, window, **kwargs)
+    if window < 1 or window > N:
+        raise ValueError('Rolling operation not possible.')
+    output = np.empty((N - window + 1, K))
+    bounds = np.linspace(0, K, threads + 1).astype(int)
+
+    def roll(block):
+        start, end = bounds[block], bounds[block + 1]
+        output[:, start:end] = rfunc(values[:, start:end], window, **kwargs)
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(roll, range(threads)))
+    return output
@@ -38,7 +38,8 @@ def ts_merge(series):
     return ts.merge(series)
 
 
-def ts_bin_op(op_name, ts1, ts2, all=True, fill=None, name=None):
+def ts_bin_op(op_name, ts1, ts2, all=True, fill=None, name=None,
+              inplace=False):
     '''Entry point for any arithmetic type function performed on a timeseries
     and/or a scalar.
     op_name - name of the function to be performed
@@ -46,6 +47,8 @@ def ts_bin_op(op_name, ts1, ts2, all=True, fill=None, name=None):
     all - whether all dates should be included in the result
     fill - the value that should be used to represent "missing values"
     name - the name of the resulting time series
+    inplace - whether the values of a timeseries operated with a scalar
+    can be overwritten by the result
     '''
     op = op_get(op_name)
     fill = fill if fill is not None else settings.missing_value
@@ -61,11 +64,13 @@ def ts_bin_op(op_name, ts1, ts2, all=True, fill=None, name=None):
             dts, data = op_ts_ts(op_name, op, ts1, ts2, all, fill_fn)
 
         else:
-            dts, data = op_ts_scalar(op_name, op, ts1, ts2, fill_fn)
+            dts, data = op_ts_scalar(op_name, op, ts1, ts2, fill_fn,
+                                     inplace)
     else:
         if is_timeseries(ts2):
             ts = ts2
-            dts, data = op_scalar_ts(op_name, op, ts1, ts2, fill_fn)
+            dts, data = op_scalar_ts(op_name, op, ts1, ts2, fill_fn,
+                                     inplace)
         else:
             return op(ts1, ts2)
 
@@ -99,6 +104,7 @@ class TimeSeries(Data, metaclass=TSmeta):
                  dtype=np.double, **params):
         super().__init__(name, info)
         self._dtype = np.dtype(dtype)
+        self._indexes = {}
         self.make(date, data, **params)
 
     __add__ = ts_fn('add')
@@ -247,13 +253,39 @@ can be used to access the timeseries as if it was a matrix.'''
 
     def asbtree(self):
         '''Return an instance of :class:`dynts.utils.wrappers.asbtree`
-which exposes binary tree like functionalities of ``self``.'''
-        return asbtree(self)
+which exposes binary tree like functionalities of ``self``. The instance is
+cached until the timeseries is modified.'''
+        btree = self._indexes.get('btree')
+        if btree is None:
+            btree = self._indexes['btree'] = asbtree(self)
+        return btree
 
     def ashash(self):
         '''Return an instance of :class:`dynts.utils.wrappers.ashash`
-which exposes hash-table like functionalities of ``self``.'''
-        return ashash(self)
+which exposes hash-table like functionalities of ``self``. The instance is
+cached until the timeseries or the instance itself are modified.'''
+        hash = self._indexes.get('hash')
+        if hash is None or hash.modified:
+            hash = self._indexes['hash'] = ashash(self)
+        return hash
+
+    def loc_many(self, dates):
+        '''Positions of *dates* in the timeseries.
+
+:parameter dates: an iterable over dates.
+:rtype: an integer ``numpy.ndarray`` with the position of each date,
+    ``-1`` for dates not in the timeseries.'''
+        hash = self._indexes.get('positions')
+        if hash is None:
+            hash = self._indexes['positions'] = dict(
+                ((dt, i) for i, dt in enumerate(self.keys())))
+        return np.array([hash.get(self.dateconvert(dt), -1) for dt in dates],
+                        dtype=int)
+
+    def reindex(self):
+        '''Clear the indexes cached by :meth:`asbtree`, :meth:`ashash` and
+:meth:`loc_many`. Backends call it when the timeseries is modified.'''
+        self._indexes.clear()
 
     # DATE OPERATORS
 
@@ -271,6 +303,12 @@ which exposes hash-table like functionalities of ``self``.'''
         '''Insert a new date-value pair at the end of the timeseries.'''
         raise NotImplementedError
 
+    def insert_many(self, dates, values):
+        '''Insert several date-value pairs. By default it calls
+        :meth:`insert` for each pair, backends can insert them in one pass.'''
+        for dte, value in zip(dates, values):
+            self.insert(dte, value)
+
     ######################################################################
     # OPERATIONS RETURNING NEW SERIES
     ######################################################################
@@ -278,6 +316,10 @@ which exposes hash-table like functionalities of ``self``.'''
     def window(self, start, end):
         raise NotImplementedError
 
+    def tail(self, size):
+        '''Return a :class:`TimeSeries` with the last *size* observations.'''
+        raise NotImplementedError
+
     def merge(self, ts, all=True):
         '''Merge this :class:`TimeSeries` with one or more :class:`TimeSeries`
 and return a new one.'''
@@ -303,57 +345,25 @@ and return a new one.'''
             return self
         return self.getalgo('reduce', method)(self, size, **kwargs)
 
-    def clean(self, algorithm=None):
+    def clean(self, algorithm=None, **kwargs):
         '''Create a new :class:`TimeSeries` with missing data removed or
-replaced by the *algorithm* provided'''
-        # all dates
-        original_dates = list(self.dates())
-        series = []
-        all_dates = set()
-        for serie in self.series():
-            dstart, dend, vend = None, None, None
-            new_dates = []
-            new_values = []
-            missings = []
-            values = {}
-            for d, v in zip(original_dates, serie):
-                if v == v:
-                    if dstart is None:
-                        dstart = d
-                    if missings:
-                        for dx, vx in algorithm(dend, vend, d, v, missings):
-                            new_dates.append(dx)
-                            new_values.append(vx)
-                        missings = []
-                    dend = d
-                    vend = v
-                    values[d] = v
-                elif dstart is not None and algorithm:
-                    missings.append((dt, v))
-            if missings:
-                for dx, vx in algorithm(dend, vend, None, None, missings):
-                    new_dates.append(dx)
-                    new_values.append(vx)
-                    dend = dx
-            series.append((dstart, dend, values))
-            all_dates = all_dates.union(values)
-        cdate = []
-        cdata = []
-        for dt in sorted(all_dates):
-            cross = []
-            for start, end, values in series:
-                if start is None or (dt >= start and dt <= end):
-                    value = values.get(dt)
-                    if value is None:
-                        cross = None
-                        break
-                else:
-                    value = nan
-                cross.append(value)
-            if cross:
-                cdate.append(dt)
-                cdata.append(cross)
-        return self.clone(date=cdate, data=cdata)
+replaced by the *algorithm* provided.
+
+:parameter algorithm: name of an algorithm registered for the ``clean``
+    operation. Available algorithms are ``dropany`` and ``dropall``, which
+    remove dates with any or all values missing, ``ffill`` and ``bfill``,
+    which replace missing values with the previous or next valid value, and
+    ``linear`` and ``time``, which interpolate between valid values. If not
+    provided, dates with a missing value between the first and last valid
+    values of a series are removed. It can also be a callable accepting
+    this :class:`TimeSeries` and *kwargs* and returning the cleaned
+    :class:`TimeSeries`.
+:parameter kwargs: parameters passed to the algorithm, fill algorithms
+    accept ``limit``, the maximum number of consecutive missing values
+    replaced.'''
+        if not hasattr(algorithm, '__call__'):
+            algorithm = self.getalgo('clean', algorithm or 'default')
+        return algorithm(self, **kwargs)
 
     ######################################################################
     # SCALAR STANDARD FUNCTIONS
@@ -391,6 +401,11 @@ replaced by the *algorithm* provided'''
         '''Calculate returns as delta(log(self)) by series'''
         return self.logdelta(fallback=fallback)
 
+    def isshared(self):
+        '''``True`` if the values of the timeseries are shared with other
+        timeseries, in which case they must not be modified in place.'''
+        return False
+
     def isconsistent(self):
         '''Check if the timeseries is consistent'''
         for dt1, dt0 in laggeddates(self):
@@ -514,6 +529,10 @@ the variances of each series in the timeseries.
         for function *func*.
         Same construct as :meth:`dynts.TimeSeries.apply` but with default
         ``window`` set to ``20``.
+
+        :keyword threads: optional number of threads. If greater than one,
+            the columns of wide timeseries are split into blocks rolled
+            concurrently.
         '''
         return self.apply(func, window=window, **kwargs)
 
@@ -549,17 +568,15 @@ the variances of each series in the timeseries.
             '''
         return self.rollapply('mean', **kwargs)
 
-    def rollsd(self, scale=1, **kwargs):
+    def rollsd(self, scale=1, ddof=0, **kwargs):
         '''A :ref:`rolling function <rolling-function>` for
-        stadard-deviation values:
+        stadard-deviation values, ``sqrt(scale*var)`` where ``var`` is the
+        rolling variance with *ddof* delta degrees of freedom.
         Same as::
 
-            self.rollapply('sd', **kwargs)
+            self.rollapply('sd', scale=scale, ddof=ddof, **kwargs)
         '''
-        ts = self.rollapply('sd', **kwargs)
-        if scale != 1:
-            ts *= scale
-        return ts
+        return self.rollapply('sd', scale=scale, ddof=ddof, **kwargs)
 
     # INTERNALS
     ################################################################
@@ -2,10 +2,16 @@
 # TimeSeries Backend based on numpy
 #
 #
+from datetime import date, datetime, timezone
+
 import numpy as np
 
 from ..api.timeseries import TimeSeries, is_timeseries
-from ..lib import Skiplist
+from ..api.names import composename
+from ..api.roll import rollsingle
+from ..conf import settings
+from ..exc import OutOfBound
+from ..utils.iterators import laggeddates
 from ..utils.section import asarray
 
 
@@ -22,28 +28,132 @@ _functions = {
 }
 
 
+def _join_dates(dates, how):
+    # Sorted array of dates for the *how* join of the arrays in *dates*
+    if how == 'left':
+        return dates[0]
+    elif how == 'inner':
+        if not all((len(dts) for dts in dates)):
+            return np.array(())
+        index = dates[0]
+        for dts in dates[1:]:
+            index = np.intersect1d(index, dts)
+        return index
+    elif how == 'outer':
+        dates = [dts for dts in dates if len(dts)]
+        if not dates:
+            return np.array(())
+        return np.unique(np.concatenate(dates))
+    else:
+        raise ValueError('Unknown merge mode %s' % how)
+
+
+def index_dtype(dtype):
+    '''The ``datetime64`` dtype of keys for ``datetime64`` *dtype*:
+    ``datetime64[D]`` for units of a day or longer, ``datetime64[us]``
+    otherwise, so that keys convert back to dates and datetimes.'''
+    unit = np.datetime_data(dtype)[0]
+    if unit in ('Y', 'M', 'W', 'D'):
+        return np.dtype('datetime64[D]')
+    return np.dtype('datetime64[us]')
+
+
+def naive_utc(dte):
+    '''Convert a timezone aware datetime into a naive datetime in UTC.'''
+    if dte.tzinfo is not None:
+        dte = dte.astimezone(timezone.utc).replace(tzinfo=None)
+    return dte
+
+
+def asindex(dates):
+    '''Convert *dates* into a native array of keys. Python dates are
+    stored as ``datetime64[D]``, datetimes as ``datetime64[us]``, in UTC if
+    timezone aware, ``datetime64`` arrays are cast to one of these two
+    units and anything else is left unchanged.'''
+    dates = asarray(dates)
+    if dates.dtype.kind == 'M':
+        return dates.astype(index_dtype(dates.dtype), copy=False)
+    if dates.dtype == object and len(dates):
+        first = dates[0]
+        if isinstance(first, datetime):
+            if any((d.tzinfo is not None for d in dates)):
+                dates = np.array([naive_utc(d) for d in dates])
+            return dates.astype('datetime64[us]')
+        elif isinstance(first, date):
+            return dates.astype('datetime64[D]')
+    return dates
+
+
+def unique_index(dates, keep='last'):
+    '''Positions which sort the array *dates* and drop duplicate dates,
+    keeping the ``first`` or ``last`` occurrence of each. ``None`` if
+    *dates* are already sorted without duplicates.'''
+    if keep not in ('first', 'last'):
+        raise ValueError('Unknown duplicates policy %s' % keep)
+    if len(dates) < 2 or (dates[1:] > dates[:-1]).all():
+        return None
+    order = np.argsort(dates, kind='mergesort')
+    dates = dates[order]
+    unique = np.empty(len(dates), dtype=bool)
+    if keep == 'first':
+        unique[0] = True
+        unique[1:] = dates[1:] != dates[:-1]
+    else:
+        unique[-1] = True
+        unique[:-1] = dates[1:] != dates[:-1]
+    return order[unique]
+
+
 def days(d1, d0):
     t = d1 - d0
     return t.days + (t.seconds + 0.000001*t.microseconds)/86400.0
 
 
 class Numpy(TimeSeries):
-    """A timeserie based on numpy
+    """A timeserie based on numpy.
+
+    Dates are stored in a native array of keys, ``datetime64`` for dates
+    and datetimes, timezone aware datetimes in UTC, and converted to python
+    objects only by :meth:`dates`, :meth:`start` and :meth:`end`. Keys are
+    sorted and searched with binary search, no other index is built.
+
+    :meth:`window`, :meth:`tail` and clones without new data are views
+    sharing the keys and values of their parent. Shared arrays are copied
+    before being modified by :meth:`insert`, check :meth:`isshared`, and so
+    are the arrays already returned by :meth:`values` and :meth:`keys`.
     """
-    def make(self, date, data, raw=False, **params):
-        if date is not None and not raw:
-            c = self.dateinverse
-            date = (c(d) for d in date)
-        date = asarray(date)
-        self._skl = Skiplist(date)
+    def make(self, date, data, raw=False, sort=False, keep=None, **params):
+        '''Build the timeseries from *date* and *data*.
+
+        :parameter raw: if ``True`` *date* is already an array of keys.
+        :parameter sort: if ``True`` rows are sorted by date and duplicate
+            dates removed, keeping the ``first`` or ``last`` occurrence
+            according to *keep*, which defaults to
+            :attr:`dynts.conf.Settings.duplicates`. Rows are reordered
+            only if dates are not already sorted.
+        '''
+        self.reindex()
+        self._kbuf = None
+        self._vbuf = None
+        self._shared = False
+        self._shared_keys = False
+        self._exported = False
+        if raw:
+            date = asarray(date)
+        else:
+            date = asindex(date)
         if date is None or not len(date):
             self._date = None
             self._data = None
         else:
-            self._date = date
             data = asarray(data, self._dtype)
             if len(data.shape) == 1:
                 data = data.reshape(len(data), 1)
+            if sort:
+                index = unique_index(date, keep or settings.duplicates)
+                if index is not None:
+                    date, data = date[index], data[index]
+            self._date = date
             self._data = data
 
     @property
@@ -65,49 +175,142 @@ class Numpy(TimeSeries):
 
     def values(self, desc=None):
         if self._data is not None:
+            self._exported = True
             return reversed(self._data) if desc else self._data
         else:
             return ()
 
     def dates(self, desc=None):
         if self._date is not None:
+            dates = self._date
+            if dates.dtype.kind == 'M':
+                dates = dates.astype(object)
+            else:
+                self._exported = True
+            return reversed(dates) if desc else dates
+        else:
+            return ()
+
+    def keys(self, desc=None):
+        if self._date is not None:
+            self._exported = True
             return reversed(self._date) if desc else self._date
         else:
             return ()
 
-    def keys(self, desc = None):
-        return self.dates(desc = desc)
+    def dateconvert(self, dte):
+        if isinstance(dte, np.datetime64):
+            return dte.astype(index_dtype(dte.dtype))
+        elif isinstance(dte, datetime):
+            return np.datetime64(naive_utc(dte), 'us')
+        elif isinstance(dte, date):
+            return np.datetime64(dte, 'D')
+        return dte
+
+    def dateinverse(self, key):
+        if isinstance(key, np.datetime64):
+            return key.astype(index_dtype(key.dtype)).item()
+        return key
 
     def start(self):
         if self:
-            return self._date[0]
+            return self.dateinverse(self._date[0])
 
     def end(self):
         if self:
-            return self._date[-1]
+            return self.dateinverse(self._date[-1])
 
     def insert(self, dte, values):
-        '''insert *values* at date *dte*.'''
+        '''insert *values* at date *dte*.
+
+        Keys and values are stored in buffers with spare capacity which
+        double in size when full, so that appending a date after :meth:`end`
+        takes constant amortized time. A date before :meth:`end` shifts the
+        rows after it within the buffers, which are copied first if arrays
+        returned by :meth:`values` or :meth:`keys` may still be in use. To
+        insert many rows out of order use :meth:`insert_many`.'''
         if len(values):
+            self.reindex()
             dte = self.dateconvert(dte)
-            if not self:
-                self._date = np.array([dte])
-                self._data = np.array([values])
-            else:
-                # search for the date
-                index = self._skl.rank(dte)
-                if index < 0:
-                    # date not available
-                    N = len(self._data)
-                    index = -1-index
-                    self._date.resize((N+1,))
-                    self._data.resize((N+1, self.count()))
-                    if index < N:
-                        self._date[index+1:] = self._date[index:-1]
-                        self._data[index+1:] = self._data[index:-1]
-                self._date[index] = dte
-                self._data[index] = values
-            self._skl.insert(dte)
+            size = len(self)
+            index = np.searchsorted(self._date, dte) if size else 0
+            if index < size:
+                self._own()
+                if self._date[index] == dte:
+                    self._data[index] = values
+                    return
+            self._reserve(size + 1, dte, values)
+            if index < size:
+                self._kbuf[index+1:size+1] = self._kbuf[index:size]
+                self._vbuf[index+1:size+1] = self._vbuf[index:size]
+            self._kbuf[index] = dte
+            self._vbuf[index] = values
+            self._fill(size + 1)
+
+    def loc_many(self, dates):
+        keys = asindex(dates)
+        if not self:
+            return np.full(len(keys), -1, dtype=int)
+        positions = np.searchsorted(self._date, keys)
+        found = positions < len(self._date)
+        found[found] = self._date[positions[found]] == keys[found]
+        positions[~found] = -1
+        return positions
+
+    def insert_many(self, dates, values):
+        '''Insert *values* at *dates* in one pass. Rows do not need to be
+        sorted, the values of a date already in the timeseries, or repeated in
+        *dates*, are replaced by the last value given.'''
+        keys = asindex(dates)
+        if not len(keys):
+            return
+        data = asarray(values, self._dtype)
+        if len(data.shape) == 1:
+            data = data.reshape(len(data), 1)
+        size = len(self)
+        if (len(keys) == 1 or (keys[1:] > keys[:-1]).all()) and (
+                not size or keys[0] > self._date[-1]):
+            # sorted rows after the end, append them to the buffers
+            self.reindex()
+            self._reserve(size + len(keys), keys[0], data[0])
+            self._kbuf[size:size+len(keys)] = keys
+            self._vbuf[size:size+len(keys)] = data
+            self._fill(size + len(keys))
+            return
+        if size:
+            keys = np.concatenate((self._date, keys))
+            data = np.concatenate((self._data, data))
+        self.make(keys, data, raw=True, sort=True, keep='last')
+
+    def _reserve(self, size, key, values):
+        # Make sure the buffers can hold *size* rows
+        if self._kbuf is not None and len(self._kbuf) >= size:
+            return
+        capacity = max(size, 2*len(self), 8)
+        if self:
+            kbuf = np.empty(capacity, dtype=self._date.dtype)
+            vbuf = np.empty((capacity, self._data.shape[1]),
+                            dtype=self._data.dtype)
+            kbuf[:len(self)] = self._date
+            vbuf[:len(self)] = self._data
+        else:
+            kbuf = np.empty(capacity, dtype=np.asarray(key).dtype)
+            vbuf = np.empty((capacity, len(values)), dtype=self._dtype)
+        self._kbuf, self._vbuf = kbuf, vbuf
+        self._shared = self._shared_keys = self._exported = False
+
+    def _own(self):
+        # Copy shared or exported keys and values into buffers owned by self
+        if self._shared or self._shared_keys or self._exported:
+            size = len(self)
+            self._kbuf = self._vbuf = None
+            self._reserve(size, None, None)
+            self._fill(size)
+
+    def _fill(self, size):
+        # Keys and values are views of the filled region of the buffers
+        self._date = self._kbuf[:size]
+        self._data = self._vbuf[:size]
 
     def isregular(self):
         dates = iter(self.dates())
@@ -128,37 +331,100 @@ class Numpy(TimeSeries):
         return freq/(len(self)-1)
 
     def window(self, start, end):
-        b = self.asbtree()
-        i1 = b.find_ge(start)
-        i2 = b.find_le(end)
-        return self.clone(self._date[i1:i2+1],
-                          self._data[i1:i2+1])
-
-    def merge(self, tserie, fill=nan, **kwargs):
+        if not self:
+            return self
+        i1 = np.searchsorted(self._date, self.dateconvert(start), 'left')
+        i2 = np.searchsorted(self._date, self.dateconvert(end), 'right')
+        return self.view(i1, i2)
+
+    def tail(self, size):
+        N = len(self)
+        if size >= N:
+            return self
+        return self.view(N-size)
+
+    def view(self, start=0, stop=None, name=None):
+        '''A timeseries with the rows from *start* to *stop*, sharing keys
+        and values with ``self``. No conversion or copy takes place, rows
+        are copied only when one of the two timeseries is modified.'''
+        ts = self.__class__(name or self.name)
+        ts._dtype = self._dtype
+        if self:
+            date = self._date[start:stop]
+            if len(date):
+                ts._date = date
+                ts._data = self._data[start:stop]
+                ts._shared = self._shared = True
+                ts._shared_keys = self._shared_keys = True
+        return ts
+
+    def clone(self, date=None, data=None, name=None):
+        if date is None and data is None:
+            return self.view(name=name)
+        ts = super().clone(date, data, name)
+        if self and ts:
+            if np.may_share_memory(ts._date, self._date):
+                ts._shared_keys = self._shared_keys = True
+            if np.may_share_memory(ts._data, self._data):
+                ts._shared = self._shared = True
+        return ts
+
+    def isshared(self):
+        return self._shared
+
+    def merge(self, tserie, fill=nan, all=True, how=None, **kwargs):
+        '''Merge with one or more timeseries in a single pass.
+
+        :parameter tserie: a :class:`TimeSeries` or an iterable over them.
+        :parameter fill: value for dates missing from a timeseries.
+        :parameter all: if ``True`` an ``outer`` join, otherwise ``inner``.
+        :parameter how: optional join mode overriding *all*, one of
+            ``outer`` (union of dates), ``inner`` (intersection of dates)
+            or ``left`` (dates of this timeseries).
+        '''
         if is_timeseries(tserie):
             tserie = [tserie]
-        else:
-            tserie = tuple(tserie)
-        alldates = set(self.dates())
-        hash = self.ashash()
+        series = [self]
+        series.extend(tserie)
+        how = how or ('outer' if all else 'inner')
         namespace = self.namespace
         with_namespace = False
-        for ts in tserie:
+        for ts in series:
             if ts.namespace != namespace:
                 with_namespace = True
                 break
-        thashes  = [(hash, np.array([fill]*self.count()))]
-        names = self.names(with_namespace)
-        for ts in tserie:
-            alldates = alldates.union(ts.dates())
+        names = []
+        for ts in series:
             names.extend(ts.names(with_namespace))
-            thashes.append((ts.ashash(),np.array([fill]*ts.count())))
-        hash.names = names
-        stack = np.hstack
-        mdt = lambda dt: stack((h.get(dt,ln) for h,ln in thashes))
-        for dt in alldates:
-            hash[dt] = mdt(dt)
-        return hash.getts()
+        name = settings.splittingnames.join(names)
+        dates = [asarray(ts.keys()) for ts in series]
+        index = _join_dates(dates, how)
+        N = len(index)
+        if not N:
+            return self.clone(date=(), data=(), name=name)
+        values = []
+        dtype = np.asarray(fill).dtype
+        for ts in series:
+            v = ts.values()
+            if len(v):
+                dtype = np.promote_types(dtype, v.dtype)
+            values.append(v)
+        data = np.empty((N, sum((ts.count() for ts in series))), dtype=dtype)
+        data.fill(fill)
+        col = 0
+        for ts, dts, v in zip(series, dates, values):
+            c = ts.count()
+            if not c:
+                continue
+            if len(dts) == N and (dts is index or np.array_equal(dts, index)):
+                data[:, col:col+c] = v
+            else:
+                pos = np.searchsorted(index, dts)
+                found = pos < N
+                found[found] = index[pos[found]] == dts[found]
+                data[pos[found], col:col+c] = v[found]
+            col += c
+        return self.clone(date=index, data=data, name=name)
 
     def min(self, fallback = False):
         return self._data.min(0)
@@ -188,21 +454,21 @@ class Numpy(TimeSeries):
         return self.clone(self._date,v,name)
 
     def delta(self, lag = 1, name = None, **kwargs):
-        self.precondition(lag<len(self) and lag > 0,dynts.DyntsOutOfBound)
+        self.precondition(lag<len(self) and lag > 0,OutOfBound)
         v = self._data[lag:] - self._data[:-lag]
         name = name or 'delta(%s,%s)' % (self.name,lag)
         return self.clone(self._date[lag:],v,name)
 
     def delta2(self, lag = 1, name = None, **kwargs):
         lag2 = 2*lag
-        self.precondition(lag2<len(self) and lag2 > 0,dynts.DyntsOutOfBound)
+        self.precondition(lag2<len(self) and lag2 > 0,OutOfBound)
         d = self._data
         v = d[lag2:] + d[:-lag2] - 2*d[lag:-lag]
         name = name or 'delta2(%s,%s)' % (self.name,lag)
         return self.clone(self._date[lag2:],v,name)
 
     def logdelta(self, lag = 1, name = None, **kwargs):
-        self.precondition(lag<len(self) and lag > 0,dynts.DyntsOutOfBound)
+        self.precondition(lag<len(self) and lag > 0,OutOfBound)
         v = np.log(self._data[lag:]/self._data[:-lag])
         name = name or 'logdelta(%s,%s)' % (self.name,lag)
         return self.clone(self._date[lag:],v,name)
@@ -30,6 +30,13 @@ class Settings(object):
 
         Default ``,``.
 
+    .. attribute:: duplicates
+
+        Which value to keep, ``"first"`` or ``"last"``, when data loaded
+        for a symbol contains the same date more than once.
+
+        Default ``"last"``.
+
     .. attribute:: default_loader
 
         Default :class:`dynts.data.TimeSerieLoader` class.
@@ -42,6 +49,14 @@ class Settings(object):
 
         Default :class:`dynts.data.DataProvider` code. Default ``"YAHOO"``.
 
+    .. attribute:: expression_cache_size
+
+        Maximum number of parsed expressions kept in the
+        :data:`dynts.dsl.rules.expressions` cache. Set to ``0`` to disable
+        the cache.
+
+        Default ``1000``.
+
     .. attribute:: field_separator
 
         Character used to separate tickers from fields and providers.
@@ -73,8 +88,10 @@ class Settings(object):
         self.separator_operator = '|'
         self.default_provider = 'YAHOO'
         self.field_separator = ':'
+        self.expression_cache_size = 1000
         self.idregex = '[a-zA-Z_][a-zA-Z_0-9:@]*'
         self.default_loader = None
+        self.duplicates = 'last'
         self.months_history = 12
         self.proxies = {}
         self.symboltransform = toupper
@@ -64,10 +64,11 @@ class TimeSerieLoader:
     '''Cordinates the loading of timeseries data
     into :class:`dynts.dsl.Symbol`.
     This class can be overritten by a custom one if required.
-    There are four different
+    There are five different
     **hooks** which can be used to customised its behaviour:
 
     * :func:`dynts.data.TimeSerieLoader.parse_symbol`
+    * :func:`dynts.data.TimeSerieLoader.extend_start`
     * :func:`dynts.data.TimeSerieLoader.preprocess`
     * :func:`dynts.data.TimeSerieLoader.onresult`
     * :func:`dynts.data.TimeSerieLoader.onfinishload`
@@ -87,7 +88,8 @@ class TimeSerieLoader:
     '''
     symboldata = SymbolData
 
-    def load(self, providers, symbols, start, end, logger, backend, **kwargs):
+    def load(self, providers, symbols, start, end, logger, backend,
+             lookback=None, **kwargs):
         '''Load symbols data.
 
         :keyword providers: Dictionary of registered data providers.
@@ -96,6 +98,9 @@ class TimeSerieLoader:
         :keyword end: end date.
         :keyword logger: instance of :class:`logging.Logger` or ``None``.
         :keyword backend: :class:`dynts.TimeSeries` backend name.
+        :keyword lookback: Optional dictionary mapping symbols to the number
+            of observations required before *start*. The start date of
+            these symbols is extended via :meth:`extend_start`.
 
         There is no need to override this function, just use one
         the three hooks available.
@@ -103,16 +108,29 @@ class TimeSerieLoader:
         # Preconditioning on dates
         logger = logger or logging.getLogger(self.__class__.__name__)
         start, end = self.dates(start, end)
+        lookback = lookback or {}
+        # Get ticker, field and provider
+        parsed = [(sym, self.parse_symbol(sym, providers)) for sym in symbols]
+        # symbols resolving to the same data are loaded once only,
+        # with the largest lookback
+        extend = {}
+        for sym, symbol in parsed:
+            full = symbol.full()
+            extend[full] = max(extend.get(full, 0), lookback.get(sym, 0))
         data = {}
-        for sym in symbols:
-            # Get ticker, field and provider
-            symbol = self.parse_symbol(sym, providers)
+        loaded = {}
+        for sym, symbol in parsed:
+            full = symbol.full()
+            if full in loaded:
+                data[sym] = loaded[full]
+                continue
             provider = symbol.provider
             if not provider:
                 raise MissingDataProvider(
                     'data provider for %s not available' % sym
                 )
-            pre = self.preprocess(symbol, start, end, logger, backend, **kwargs)
+            st = self.extend_start(start, extend[full])
+            pre = self.preprocess(symbol, st, end, logger, backend, **kwargs)
             if pre.intervals:
                 result = None
                 for st, en in pre.intervals:
@@ -128,7 +146,7 @@ class TimeSerieLoader:
                 result = pre.result
             # onresult hook
             result = self.onresult(symbol, result, logger, backend, **kwargs)
-            data[sym] = result
+            data[sym] = loaded[full] = result
         # last hook
         return self.onfinishload(data, logger, backend, **kwargs)
 
@@ -152,6 +170,18 @@ There should be no reason to override this function.'''
                                                    settings.months_history)))
         return start,end
 
+    def extend_start(self, start, lookback):
+        '''Return the start date of an interval containing *lookback*
+observations before *start*. By default observations are assumed to be daily
+on business days, with an allowance of one holiday every twenty days.
+
+:keyword start: start date.
+:keyword lookback: number of observations required before *start*.'''
+        if not lookback:
+            return start
+        weeks, days = divmod(lookback, 5)
+        return start - timedelta(days=7*weeks + days + 2 + lookback // 20)
+
     def parse_symbol(self, symbol, providers):
         '''Parse a symbol to obtain information regarding ticker,
         field and provider. Must return an instance of :attr:`symboldata`.
@@ -265,11 +295,18 @@ class DataProviders(dict):
 
     def load(self, symbols, start=None, end=None, loader=None,
              logger=None,  backend=None, **kwargs):
-        loader = loader or settings.default_loader or TimeSerieLoader
+        loader = self.get_loader(loader)
         backend = backend or settings.backend
+        return loader.load(self, symbols, start, end, logger, backend, **kwargs)
+
+    def get_loader(self, loader=None):
+        '''Return an instance of :class:`TimeSerieLoader` from *loader*,
+        a class or an instance. If not given the
+        :attr:`dynts.conf.Settings.default_loader` is used.'''
+        loader = loader or settings.default_loader or TimeSerieLoader
         if isinstance(loader, type):
             loader = loader()
-        return loader.load(self, symbols, start, end, logger, backend, **kwargs)
+        return loader
 
     def register(self, provider):
         '''Register a new data provider. *provider* must be an instance of
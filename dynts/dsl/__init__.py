@@ -3,6 +3,9 @@
 Created using ply (http://www.dabeaz.com/ply/) a pure Python implementation
 of the popular compiler construction tools lex and yacc.
 '''
+from time import perf_counter
+
+import numpy as np
 from ccy import todate
 
 from ..conf import settings
@@ -13,6 +16,8 @@ from ..data import providers
 
 from .functions import function_registry
 from .rules import parsefunc
+from .plan import ExpressionPlan
+from .profile import Profile
 
 
 def parse(timeseries_expression, method=None, functions=None, debug=False):
@@ -44,7 +49,8 @@ def parse(timeseries_expression, method=None, functions=None, debug=False):
 
 
 def evaluate(expression, start=None, end=None, loader=None, logger=None,
-             backend=None, **kwargs):
+             backend=None, executor=None, tail=None, profile=False,
+             **kwargs):
     '''Evaluate a timeseries ``expression`` into
     an instance of :class:`dynts.dsl.dslresult` which can be used
     to obtain timeseries and/or scatters.
@@ -64,10 +70,28 @@ def evaluate(expression, start=None, end=None, loader=None, logger=None,
 
         Default ``None``.
     :parameter backend: :class:`dynts.TimeSeries` backend name or ``None``.
+    :parameter executor: Optional :class:`concurrent.futures.Executor` or
+        number of threads used to evaluate independent sub-expressions
+        concurrently. Check :meth:`~.ExpressionPlan.unwind`.
+
+        Default ``None``.
+    :parameter tail: Optional number of observations. If provided only the
+        last ``tail`` values of the expression are evaluated, using the
+        minimal slice of data required by each symbol. ``start`` is ignored.
+
+        Default ``None``.
+    :parameter profile: If ``True`` the time spent loading data and the
+        statistics of each node are collected in :attr:`DSLResult.profile`.
+        Check :meth:`DSLResult.explain`.
+
+        Default ``False``.
 
     The ``expression`` is parsed and the :class:`~.Symbol` are sent to the
     :class:`dynts.data.TimeSerieLoader` instance for retrieving
     actual timeseries data.
+    The date range of each symbol is extended by the lookback required by
+    the functions applied to it (check :meth:`~.ExpressionPlan.lookback`),
+    and the result is trimmed back to the ``start``, ``end`` range.
     It returns an instance of :class:`~.DSLResult`.
 
     Typical usage::
@@ -85,9 +109,92 @@ def evaluate(expression, start=None, end=None, loader=None, logger=None,
     symbols = expression.symbols()
     start = start if not start else todate(start)
     end = end if not end else todate(end)
+    loader = providers.get_loader(loader)
+    plan = ExpressionPlan([expression])
+    lookback = plan.lookback()
+    if tail:
+        start, end = loader.dates(start, end)
+        start = loader.extend_start(end, tail)
+    load_start = perf_counter()
     data = providers.load(symbols, start, end, loader=loader,
-                          logger=logger, backend=backend, **kwargs)
-    return DSLResult(expression, data, backend=backend)
+                          logger=logger, backend=backend, lookback=lookback,
+                          **kwargs)
+    result = DSLResult(expression, data, backend=backend, executor=executor)
+    result.plan = plan
+    if profile:
+        result.profile = Profile(plan, perf_counter() - load_start)
+    if tail:
+        result.tail = tail
+    elif any(lookback.values()):
+        result.start, result.end = loader.dates(start, end)
+    return result
+
+
+def evaluate_many(expressions, start=None, end=None, loader=None, logger=None,
+                  backend=None, executor=None, profile=False, **kwargs):
+    '''Evaluate several timeseries ``expressions`` at once and return
+    a list of :class:`~.DSLResult`, one for each expression.
+
+    The expressions are merged into an :class:`~.ExpressionPlan`, so that
+    sub-expressions shared by several expressions, including the ones
+    inside composite functions, are evaluated only once.
+    The symbols of all expressions are loaded once, over the widest date
+    range required extended by their lookback, and each result is trimmed
+    to the range of its expression.
+
+    :parameter expressions: an iterable over timeseries expression strings,
+        :class:`dynts.dsl.Expr` or three-elements tuples
+        ``(expression, start, end)`` for expressions with their own
+        date range.
+
+    Other parameters are the same as :func:`~.evaluate`, ``start`` and
+    ``end`` are the date range of expressions without their own.
+
+    Typical usage::
+
+        >>> from dynts import api
+        >>> results = api.evaluate_many(['avol(GOOG)',
+        ...                              'sd(ldelta(GOOG),window=60)'])
+        >>> results[0].plan.eliminated
+        2
+    '''
+    loader = providers.get_loader(loader)
+    items = []
+    for expression in expressions:
+        if isinstance(expression, tuple):
+            expression, st, en = expression
+        else:
+            st, en = start, end
+        if isinstance(expression, str):
+            expression = parse(expression)
+        items.append((expression, loader.dates(st, en)))
+    plan = ExpressionPlan((e for e, _ in items))
+    if items:
+        start = min((st for _, (st, _) in items))
+        end = max((en for _, (_, en) in items))
+    lookback = plan.lookback()
+    load_start = perf_counter()
+    data = providers.load(plan.symbols(), start, end, loader=loader,
+                          logger=logger, backend=backend, lookback=lookback,
+                          **kwargs)
+    if profile:
+        profile = Profile(plan, perf_counter() - load_start)
+    if logger:
+        logger.info('Evaluating %s expressions with %s nodes, %s eliminated',
+                    len(items), len(plan), plan.eliminated)
+    backend = backend or settings.backend
+    results = []
+    plan_results = plan.unwind(data, backend, executor=executor,
+                               profile=profile or None)
+    for (expression, dates), res in zip(items, plan_results):
+        result = DSLResult(expression, data, backend=backend)
+        result.plan = plan
+        result.profile = profile or None
+        if dates != (start, end) or any(lookback.values()):
+            result.start, result.end = dates
+        result._setresult(res)
+        results.append(result)
+    return results
 
 
 class DSLResult:
@@ -107,11 +214,49 @@ class DSLResult:
     .. attribute:: backend
 
         backend used when populating timeseries.
+
+    .. attribute:: plan
+
+        The :class:`~.ExpressionPlan` used to evaluate the expression.
+        Available once the result has been unwound or when obtained from
+        :func:`~.evaluate_many`.
+
+    .. attribute:: executor
+
+        Optional :class:`concurrent.futures.Executor` or number of threads
+        used to unwind the expression.
+
+    .. attribute:: start
+
+        Optional start date. Timeseries are trimmed to start from it.
+
+    .. attribute:: end
+
+        Optional end date. Timeseries are trimmed to end at it.
+
+    .. attribute:: tail
+
+        Optional number of observations. If provided, symbols are sliced
+        from a common start date, the earliest date required by the
+        expression across symbols, and the result is trimmed to its last
+        ``tail`` values.
+
+    .. attribute:: profile
+
+        Optional :class:`~.Profile` collecting the statistics of the
+        evaluation. Check :meth:`explain`.
     '''
-    def __init__(self, expression, data, backend = None):
+    plan = None
+    start = None
+    end = None
+    tail = None
+    profile = None
+
+    def __init__(self, expression, data, backend=None, executor=None):
         self.expression = expression
         self.data = data
         self.backend = backend or settings.backend
+        self.executor = executor
 
     def __repr__(self):
         return self.expression.__repr__()
@@ -119,9 +264,14 @@ class DSLResult:
     def __str__(self):
         return self.__repr__()
 
-    def unwind(self):
+    def unwind(self, executor=None):
+        '''Evaluate the expression, if not already done.
+
+        :parameter executor: Optional :class:`concurrent.futures.Executor`
+            or number of threads overriding :attr:`executor`.
+        '''
         if not hasattr(self, '_ts'):
-            self._unwind()
+            self._unwind(executor or self.executor)
         return self
 
     def ts(self):
@@ -134,12 +284,24 @@ class DSLResult:
         self.unwind()
         return self._xy
 
-    def _unwind(self):
-        res = self.expression.unwind(self.data, self.backend)
+    def _unwind(self, executor=None):
+        if self.plan is None:
+            self.plan = ExpressionPlan([self.expression])
+        data = self.data
+        if self.tail is not None:
+            start = self._tail_start(data, self.plan.lookback())
+            if start is not None:
+                data = dict(((name, self._slice(value, start))
+                             for name, value in data.items()))
+        res = self.plan.unwind(data, self.backend, executor=executor,
+                               profile=self.profile)
+        self._setresult(res[0])
+
+    def _setresult(self, res):
         self._ts = None
         self._xy = None
         if is_timeseries(res):
-            self._ts = res
+            self._ts = self.trim(res)
         elif res and isinstance(res,list):
             tss = []
             xys = []
@@ -149,12 +311,60 @@ class DSLResult:
                 elif is_scatter(v):
                     xys.append(v)
             if tss:
-                self._ts = ts_merge(tss)
+                self._ts = self.trim(ts_merge(tss))
             if xys:
                 self._xy = xys
         elif is_scatter(res):
             self._xy = res
 
+    def explain(self):
+        '''Return the :class:`~.Profile` of the evaluation, which can be
+        displayed as a tree via :meth:`~.Profile.tree` or as JSON via
+        :meth:`~.Profile.json`.
+
+        If the expression has not been unwound yet, it is unwound with
+        profiling enabled. Otherwise, if it was not profiled, the profile
+        only contains the plan of the evaluation.'''
+        if self.profile is None:
+            if self.plan is None:
+                self.plan = ExpressionPlan([self.expression])
+            self.profile = Profile(self.plan)
+        self.unwind()
+        return self.profile
+
+    def _tail_start(self, data, lookback):
+        # The earliest date, across symbols, of the last observations
+        # required to evaluate the last tail values
+        start = None
+        for name, value in data.items():
+            if is_timeseries(value) and value:
+                keys = np.asarray(value.keys())
+                n = min(lookback.get(name, 0) + self.tail, len(keys))
+                if start is None or keys[-n] < start:
+                    start = keys[-n]
+        return start
+
+    def _slice(self, value, start):
+        if is_timeseries(value) and value:
+            keys = np.asarray(value.keys())
+            return value.tail(len(keys) - np.searchsorted(keys, start))
+        return value
+
+    def trim(self, ts):
+        '''Trim the timeseries *ts* to the :attr:`start`, :attr:`end`
+        range and to the last :attr:`tail` observations.'''
+        if ts and self.tail is not None:
+            ts = ts.tail(self.tail)
+        if not ts or (self.start is None and self.end is None):
+            return ts
+        start = ts.start() if self.start is None else self.start
+        end = ts.end() if self.end is None else self.end
+        if ts.start() >= start and ts.end() <= end:
+            return ts
+        elif end < start or ts.end() < start or ts.start() > end:
+            return ts.clone(date=(), data=())
+        return ts.window(start, end)
+
     def dump(self, format, **kwargs):
         ts = self.ts()
         xy = self.xy()
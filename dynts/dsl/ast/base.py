@@ -6,7 +6,14 @@ from ...api import timeseries, is_timeseries
 
 class Expr:
     '''Base class for abstract syntax nodes
+
+    .. attribute:: inplace
+
+        ``True`` if :meth:`_evaluate` accepts the ``inplace`` flag, which
+        allows to overwrite the timeseries in ``inputs``.
     '''
+    inplace = False
+
     def count(self):
         '''Number of nodes'''
         return 1
@@ -40,18 +47,50 @@ class Expr:
     def removeduplicates(self, entries=None):
         return None
 
+    def arguments(self):
+        '''List of :class:`Expr` which are unwound before this node and
+        passed as ``inputs`` to :meth:`_evaluate`.'''
+        return ()
+
+    def copy(self, replace=None):
+        '''Return a copy of the expression tree.
+
+        :parameter replace: optional callable invoked on each node. If it
+            returns an :class:`Expr`, it is used in place of the copy of
+            the node.
+        '''
+        if replace is not None:
+            node = replace(self)
+            if node is not None:
+                return node
+        clone = self.__class__.__new__(self.__class__)
+        for name, value in self.__dict__.items():
+            if isinstance(value, Expr):
+                value = value.copy(replace)
+            elif isinstance(value, list):
+                value = [v.copy(replace) if isinstance(v, Expr) else v
+                         for v in value]
+            clone.__dict__[name] = value
+        return clone
+
     def unwind(self, values, backend, **kwargs):
         '''Unwind expression by applying *values* to the abstract nodes.
 
         The ``kwargs`` dictionary can contain data which can be used
-        to override values
+        to override values. Nothing is stored on the expression tree,
+        so that the same expression can be unwound concurrently.
         '''
-        if not hasattr(self, "_unwind_value"):
-            self._unwind_value = self._unwind(values, backend, **kwargs)
-        return self._unwind_value
+        return self._unwind(values, backend, **kwargs)
 
     def _unwind(self, values, backend, **kwargs):
-        raise NotImplementedError("Unwind method missing for %s" % self)
+        inputs = [arg.unwind(values, backend, **kwargs)
+                  for arg in self.arguments()]
+        return self._evaluate(values, backend, inputs)
+
+    def _evaluate(self, values, backend, inputs):
+        '''Evaluate the node once its :meth:`arguments` have been unwound
+        into *inputs*.'''
+        raise NotImplementedError("Evaluate method missing for %s" % self)
 
 
 class BaseExpression(Expr):
@@ -77,6 +116,9 @@ class Expression(BaseExpression):
     def symbols(self):
         return self.value.symbols()
 
+    def arguments(self):
+        return (self.value,)
+
     def removeduplicates(self, entries=None):
         if entries is None:
             entries = {}
@@ -98,7 +140,7 @@ class Number(BaseExpression):
     A simple number.
     This expression is a constant numeric value
     '''
-    def _unwind(self, values, backend, **kwargs):
+    def _evaluate(self, values, backend, inputs):
         return self.value
 
 
@@ -138,22 +180,16 @@ class Symbol(BaseExpression):
     def symbols(self):
         return [self.value]
 
-    def _unwind(self, values, backend, **kwargs):
+    def _evaluate(self, values, backend, inputs):
         sdata = values[self.value]
         if is_timeseries(sdata):
             return sdata
         else:
-            ts = timeseries(name=str(self),
-                            date=sdata['date'],
-                            data=sdata['value'],
-                            backend=backend)
-            # Uses this hack to make sure timeseries are ordered
-            # Lots of room for performance improvement
-            hash = ts.ashash()
-            hash.modified = True
-            ts = hash.getts()
-            values[ts.name] = ts
-            return ts
+            return timeseries(name=str(self),
+                              date=sdata['date'],
+                              data=sdata['value'],
+                              backend=backend,
+                              sort=True)
 
     def lineardecomp(self):
         return linearDecomp().append(self)
@@ -176,6 +212,9 @@ class MultiExpression(Expr):
     def __len__(self):
         return len(self.children)
 
+    def arguments(self):
+        return self.children
+
     def __iter__(self):
         return self.children.__iter__()
 
@@ -251,11 +290,8 @@ class ConcatenationOp(ConcatOp):
         c = self.concat_operator
         return reduce(lambda x, y: '%s%s %s' % (x, c, y), self.children)
 
-    def _unwind(self, values, backend, sametype=True, **kwargs):
-        result = []
-        for child in self:
-            result.append(child.unwind(values, backend, **kwargs))
-        return result
+    def _evaluate(self, values, backend, inputs):
+        return list(inputs)
 
 
 class SplittingOp(ConcatOp):
@@ -306,12 +342,18 @@ class EqualOp(BinOp):
             left = Parameter(left.value)
         super().__init__(left, right, "=")
 
+    def arguments(self):
+        return (self.right,)
+
     def _unwind(self, values, backend, **kwargs):
         name = str(self.left)
         if name in kwargs:
             return {name: kwargs[name]}
         else:
-            return {name: self.right.unwind(values, backend, **kwargs)}
+            return super()._unwind(values, backend, **kwargs)
+
+    def _evaluate(self, values, backend, inputs):
+        return {str(self.left): inputs[0]}
 
 
 class Bracket(Expression):
@@ -329,9 +371,9 @@ class Bracket(Expression):
     def info(self):
         return '%s%s%s' % (self.__pl, self.value, self.__pr)
 
-    def _unwind(self, *args, **kwargs):
-        data = self.value.unwind(*args, **kwargs)
-        if not isinstance(data,list):
+    def _evaluate(self, values, backend, inputs):
+        data = inputs[0]
+        if not isinstance(data, list):
             data = [data]
         args = []
         kwargs = {}
@@ -3,15 +3,16 @@ from .base import BinOp, Number
 
 
 class BinMathOp(BinOp):
+    inplace = True
 
     def __init__(self, left, right, op, op_name):
         self.op_name = op_name
         super().__init__(left, right, op)
 
-    def _unwind(self, values, backend, full=False, **kwargs):
-        le = self.left.unwind(values, backend, **kwargs)
-        ri = self.right.unwind(values, backend, **kwargs)
-        return ts_bin_op(self.op_name, le, ri, name=str(self))
+    def _evaluate(self, values, backend, inputs, inplace=False):
+        le, ri = inputs
+        return ts_bin_op(self.op_name, le, ri, name=str(self),
+                         inplace=inplace)
 
     def lineardecomp(self):
         if isinstance(self.left, Number):
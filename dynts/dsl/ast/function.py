@@ -22,7 +22,7 @@ class Function(Bracket):
     def info(self):
         return '{0}{1}'.format(self.func, super().info())
 
-    def _unwind(self, values, backend, **kwargs):
-        args, kwargs = super()._unwind(values, backend, **kwargs)
-        return self.func(*args, **kwargs)
+    def _evaluate(self, values, backend, inputs):
+        args, kwargs = super()._evaluate(values, backend, inputs)
+        return self.func(args, **kwargs)
 
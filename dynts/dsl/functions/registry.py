@@ -1,7 +1,17 @@
 import inspect
 
+from ...exc import CouldNotParse, FunctionTypeError
+
 
 class FunctionRegistry(dict):
+    """Dictionary of dsl functions.
+
+    .. attribute:: version
+
+        Integer incremented every time a function is registered or
+        unregistered. Used by the parser cache to detect changes.
+    """
+    version = 0
 
     def register(self, function):
         """Register a function in the function registry.
@@ -11,6 +21,7 @@ class FunctionRegistry(dict):
         function = inspect.isclass(function) and function() or function
         name = function.name
         self[name] = function
+        self.version += 1
 
     def unregister(self, name):
         """Unregister function by name.
@@ -19,7 +30,10 @@ class FunctionRegistry(dict):
             name = name.name
         except AttributeError:
             pass
-        return self.pop(name,None)
+        function = self.pop(name, None)
+        if function is not None:
+            self.version += 1
+        return function
 
 
 class ASTFunctionMeta(type):
@@ -68,34 +82,69 @@ The only member function to implement is the ``__call__`` method.
     def __str__(self):
         return self.name
 
+    def lookback(self, **kwargs):
+        '''Number of observations of the inputs consumed before the first
+        value of the output, given the function parameters *kwargs*.
+        Used to extend the date range of the data to load.
+        By default ``0``.'''
+        return 0
+
     def __repr__(self):
         return self.name
 
 
 class CompositeBase(FunctionBase):
-    '''Base class for a timeseries function implementation.
-The only member function to implement is the ``__call__`` method.
+    '''Base class for functions defined as a composition of other
+functions via :func:`composeFunction`.
 
-    .. function:: __call__(args, **kwargs)
-
-        where *args* is a list of arguments (timeseries or other objects) and
-        *kwargs* is a dictionary of input parameters.
-        For example, the rolling-standard deviation is defined as::
-
-            std(expression,window=20)
+    The :attr:`composite` expression is compiled into a :attr:`template`
+    once, when the function is registered. At call time the arguments are
+    bound to the symbols ``x1``, ``x2``, ... of the template.
     '''
     abstract = True
+    composite = None
+
+    def __init__(self):
+        self.template = self.compile()
+
+    def compile(self):
+        '''Parse :attr:`composite` into an expression template'''
+        from ..rules import parsefunc
+        return parsefunc(str(self.composite).lower(), function_registry,
+                         None, False)
+
+    def get_template(self):
+        if self.template.malformed():
+            # the composite uses functions registered after this one
+            self.template = self.compile()
+            if self.template.malformed():
+                raise CouldNotParse(self.composite)
+        return self.template
+
+    def inline(self, args, kwargs=None):
+        '''Return a copy of the :attr:`template` where the symbols ``x1``,
+        ``x2``, ... are replaced by the expressions in *args* and the
+        parameters by the expressions in the *kwargs* dictionary.'''
+        from ..ast import Symbol, EqualOp
+        symbols = dict((('X{0}'.format(n+1), a) for n, a in enumerate(args)))
+        kwargs = kwargs or {}
+
+        def replace(node):
+            if isinstance(node, Symbol):
+                return symbols.get(node.value)
+            elif isinstance(node, EqualOp):
+                name = str(node.left)
+                if name in kwargs:
+                    return EqualOp(node.left, kwargs[name])
+
+        return self.get_template().copy(replace)
 
     def __call__(self, args, **kwargs):
-        import dynts
-        expression = dynts.parse(self.composite)
-
-        if args:
-            data = dict((('X{0}'.format(n+1),ts) for n,ts in enumerate(args)))
-            backend = args[0].type
-            return expression.unwind(data, backend, **kwargs)
-        else:
-            raise ValueError
+        if not args:
+            raise FunctionTypeError(self, 'no arguments')
+        data = dict((('X{0}'.format(n+1), ts) for n, ts in enumerate(args)))
+        backend = args[0].type
+        return self.get_template().unwind(data, backend, **kwargs)
 
 
 def composeFunction(name, comp, description='', docs=''):
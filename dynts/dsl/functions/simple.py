@@ -23,6 +23,16 @@ class ScalarWindowFunction(ScalarFunction):
     def get_name(self, arg, window, **kwargs):
         return '%s(%s,window=%s)' % (self.name, arg, window)
 
+    def lookback(self, window=20, **kwargs):
+        return int(window) - 1
+
+
+class ScalarLagFunction(ScalarFunction):
+    abstract = True
+
+    def lookback(self, lag=1, **kwargs):
+        return int(lag)
+
 
 class Log(ScalarFunction):
     """Calculate the natural logarithm of a timeseries. It applies to each
@@ -49,7 +59,7 @@ value and return a timeseries with exactly the same dimensions.
         return ts.square(**kwargs)
 
 
-class Delta(ScalarFunction):
+class Delta(ScalarLagFunction):
     """\
 First order differencing evaluated as
 
@@ -72,7 +82,7 @@ Or for calculating standard deviation on changes::
         return ts.delta(**kwargs)
 
 
-class Delta2(ScalarFunction):
+class Delta2(ScalarLagFunction):
     """\
     Second order difference evaluated as
 
@@ -93,11 +103,14 @@ class Delta2(ScalarFunction):
 
     :parameter lag: backward lag. Default ``1``.
     """
+    def lookback(self, lag=1, **kwargs):
+        return 2*int(lag)
+
     def apply(self, ts, **kwargs):
         return ts.delta2(**kwargs)
 
 
-class LDelta(ScalarFunction):
+class LDelta(ScalarLagFunction):
     """\
     Calculate the logarithmic difference of a timeseries.
     This is the first order difference
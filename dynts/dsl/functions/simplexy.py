@@ -1,6 +1,6 @@
 from .registry import FunctionBase
 from ...api.scatter import Scatter
-from ...exc import FunctionTypeError, DateNotFound
+from ...exc import FunctionTypeError
 
 
 class ScatterFunction(FunctionBase):
@@ -15,14 +15,12 @@ class ScatterFunction(FunctionBase):
     def __call__(self, args, **kwargs):
         if not len(args) == 2:
             raise FunctionTypeError(self, "function requires two timeseries")
-        ts0 = args[0]
-        ts1 = args[1].ashash();
-        name = '%s(%s,%s)' % (self.name,ts0.name,args[1].name)
+        ts0, ts1 = args
+        name = '%s(%s,%s)' % (self.name,ts0.name,ts1.name)
+        positions = ts1.loc_many(ts0.keys())
+        values1 = ts1.values()
         data = []
-        for dt, v0 in ts0.items():
-            try:
-                v1 = ts1[dt]
-            except DateNotFound:
-                continue
-            data.append((v0[0], v1[0], dt))
+        for (dt, v0), i in zip(ts0.items(), positions):
+            if i >= 0:
+                data.append((v0[0], values1[i][0], dt))
         return Scatter(name=name, data=data, lines=False, extratype='date')
@@ -0,0 +1,50 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'SLR'
+
+_lr_signature = 'leftQUOTEleftSPLITleftCONCATleftEQUALleftPLUSMINUSleftTIMESDIVIDECONCAT DIVIDE EQUAL FUNCTION ID LPAREN LSQUARE MINUS NUMBER PLUS QUOTE RPAREN RSQUARE SPLIT TIMESexpression : QUOTE expression QUOTEexpression : expression PLUS expression\n                  | expression MINUS expression\n                  | expression TIMES expression\n                  | expression DIVIDE expression\n                  | expression EQUAL expression\n                  | expression CONCAT expression\n                  | expression SPLIT expressionexpression : LPAREN expression RPAREN\n                  | LSQUARE expression RSQUAREexpression : NUMBERexpression : IDexpression : MINUS NUMBERexpression : ID IDexpression : NUMBER IDexpression : ID NUMBERexpression : FUNCTION LPAREN expression RPARENexpression : FUNCTION LPAREN expressionexpression : ID LPAREN expression RPARENexpression : ID LPAREN expression'
+    
+_lr_action_items = {'QUOTE':([0,2,4,5,6,7,9,10,11,12,13,14,15,16,17,20,21,22,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[2,2,2,2,-11,-12,2,2,2,2,2,2,2,32,-13,-15,-14,-16,2,2,-2,-3,-4,-5,-6,-7,-8,-1,-9,-10,-20,-18,-19,-17,]),'LPAREN':([0,2,4,5,7,8,9,10,11,12,13,14,15,23,24,],[4,4,4,4,23,24,4,4,4,4,4,4,4,4,4,]),'LSQUARE':([0,2,4,5,9,10,11,12,13,14,15,23,24,],[5,5,5,5,5,5,5,5,5,5,5,5,5,]),'NUMBER':([0,2,3,4,5,7,9,10,11,12,13,14,15,23,24,],[6,6,17,6,6,22,6,6,6,6,6,6,6,6,6,]),'ID':([0,2,4,5,6,7,9,10,11,12,13,14,15,23,24,],[7,7,7,7,20,21,7,7,7,7,7,7,7,7,7,]),'MINUS':([0,1,2,4,5,6,7,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[3,10,3,3,3,-11,-12,3,3,3,3,3,3,3,10,-13,10,10,-15,-14,-16,3,3,-2,-3,-4,-5,10,10,10,-1,-9,-10,10,10,-19,-17,]),'FUNCTION':([0,2,4,5,9,10,11,12,13,14,15,23,24,],[8,8,8,8,8,8,8,8,8,8,8,8,8,]),'$end':([1,6,7,17,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[0,-11,-12,-13,-15,-14,-16,-2,-3,-4,-5,-6,-7,-8,-1,-9,-10,-20,-18,-19,-17,]),'PLUS':([1,6,7,16,17,18,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[9,-11,-12,9,-13,9,9,-15,-14,-16,-2,-3,-4,-5,9,9,9,-1,-9,-10,9,9,-19,-17,]),'TIMES':([1,6,7,16,17,18,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[11,-11,-12,11,-13,11,11,-15,-14,-16,11,11,-4,-5,11,11,11,-1,-9,-10,11,11,-19,-17,]),'DIVIDE':([1,6,7,16,17,18,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[12,-11,-12,12,-13,12,12,-15,-14,-16,12,12,-4,-5,12,12,12,-1,-9,-10,12,12,-19,-17,]),'EQUAL':([1,6,7,16,17,18,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[13,-11,-12,13,-13,13,13,-15,-14,-16,-2,-3,-4,-5,-6,13,13,-1,-9,-10,13,13,-19,-17,]),'CONCAT':([1,6,7,16,17,18,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[14,-11,-12,14,-13,14,14,-15,-14,-16,-2,-3,-4,-5,-6,-7,14,-1,-9,-10,14,14,-19,-17,]),'SPLIT':([1,6,7,16,17,18,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[15,-11,-12,15,-13,15,15,-15,-14,-16,-2,-3,-4,-5,-6,-7,-8,-1,-9,-10,15,15,-19,-17,]),'RPAREN':([6,7,17,18,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[-11,-12,-13,33,-15,-14,-16,-2,-3,-4,-5,-6,-7,-8,-1,-9,-10,37,38,-19,-17,]),'RSQUARE':([6,7,17,19,20,21,22,25,26,27,28,29,30,31,32,33,34,35,36,37,38,],[-11,-12,-13,34,-15,-14,-16,-2,-3,-4,-5,-6,-7,-8,-1,-9,-10,-20,-18,-19,-17,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'expression':([0,2,4,5,9,10,11,12,13,14,15,23,24,],[1,16,18,19,25,26,27,28,29,30,31,35,36,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> expression","S'",1,None,None,None),
+  ('expression -> QUOTE expression QUOTE','expression',3,'p_expression_string','grammar.py',11),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_binop','grammar.py',16),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_binop','grammar.py',17),
+  ('expression -> expression TIMES expression','expression',3,'p_expression_binop','grammar.py',18),
+  ('expression -> expression DIVIDE expression','expression',3,'p_expression_binop','grammar.py',19),
+  ('expression -> expression EQUAL expression','expression',3,'p_expression_binop','grammar.py',20),
+  ('expression -> expression CONCAT expression','expression',3,'p_expression_binop','grammar.py',21),
+  ('expression -> expression SPLIT expression','expression',3,'p_expression_binop','grammar.py',22),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','grammar.py',43),
+  ('expression -> LSQUARE expression RSQUARE','expression',3,'p_expression_group','grammar.py',44),
+  ('expression -> NUMBER','expression',1,'p_expression_number','grammar.py',53),
+  ('expression -> ID','expression',1,'p_expression_id','grammar.py',58),
+  ('expression -> MINUS NUMBER','expression',2,'p_expression_minus_number','grammar.py',63),
+  ('expression -> ID ID','expression',2,'p_expression_id2','grammar.py',68),
+  ('expression -> NUMBER ID','expression',2,'p_expression_id_number1','grammar.py',73),
+  ('expression -> ID NUMBER','expression',2,'p_expression_id_number2','grammar.py',78),
+  ('expression -> FUNCTION LPAREN expression RPAREN','expression',4,'p_expression_function','grammar.py',83),
+  ('expression -> FUNCTION LPAREN expression','expression',3,'p_expression_bad_function','grammar.py',88),
+  ('expression -> ID LPAREN expression RPAREN','expression',4,'p_expression_bad_function2','grammar.py',93),
+  ('expression -> ID LPAREN expression','expression',3,'p_expression_bad_function3','grammar.py',98),
+]
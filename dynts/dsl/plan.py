@@ -0,0 +1,324 @@
+'''Evaluation plans for one or more expressions.
+
+An :class:`ExpressionPlan` merges several :class:`dynts.dsl.Expr` trees
+into a single directed acyclic graph where identical sub-expressions are
+evaluated only once and their result is shared by all the expressions
+which use them. Composite functions are expanded into their template so
+that sub-expressions inside composites are shared too.
+'''
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ..api.timeseries import is_timeseries
+from ..exc import CouldNotParse
+from .ast import ConcatenationOp, EqualOp, Function, Number, Symbol
+from .functions.registry import CompositeBase
+
+
+class PlanNode:
+    '''A node in an :class:`ExpressionPlan`.
+
+    .. attribute:: key
+
+        Unique key of the node, given by the expression type and its
+        string representation.
+
+    .. attribute:: expression
+
+        The :class:`dynts.dsl.Expr` evaluated by the node.
+
+    .. attribute:: children
+
+        List of :class:`PlanNode` providing the inputs of the node.
+
+    .. attribute:: size
+
+        Number of nodes of the expression tree this node replaces.
+    '''
+    __slots__ = ('key', 'expression', 'children', 'size')
+
+    def __init__(self, key, expression, children):
+        self.key = key
+        self.expression = expression
+        self.children = children
+        self.size = 1 + sum((c.size for c in children))
+
+    def __repr__(self):
+        return str(self.expression)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def evaluate(self, values, backend, inputs, inplace=False):
+        if inplace:
+            return self.expression._evaluate(values, backend, inputs,
+                                             inplace=True)
+        return self.expression._evaluate(values, backend, inputs)
+
+
+class ExpressionPlan:
+    '''Merge a list of expressions into a directed acyclic graph of
+    :class:`PlanNode`.
+
+    :parameter expressions: an iterable over :class:`dynts.dsl.Expr`.
+
+    .. attribute:: nodes
+
+        List of unique :class:`PlanNode` in topological order, children
+        always come before their consumers.
+
+    .. attribute:: roots
+
+        List of :class:`PlanNode`, one for each input expression.
+
+    .. attribute:: eliminated
+
+        Number of nodes which are not evaluated because identical to a
+        node already in the plan.
+    '''
+    def __init__(self, expressions):
+        self.expressions = list(expressions)
+        self.nodes = []
+        self.eliminated = 0
+        self._keys = {}
+        for expression in self.expressions:
+            if not expression or expression.malformed():
+                raise CouldNotParse(expression)
+        self.roots = [self.add(e) for e in self.expressions]
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__,
+                           ', '.join((str(e) for e in self.expressions)))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def key(self, expression):
+        return expression.type, str(expression)
+
+    def add(self, expression):
+        '''Add *expression* to the plan and return its :class:`PlanNode`.'''
+        key = self.key(expression)
+        node = self._keys.get(key)
+        if node is not None:
+            self.eliminated += node.size
+            return node
+        inlined = self.inline(expression)
+        if inlined is not None:
+            node = self.add(inlined)
+        else:
+            children = [self.add(arg) for arg in expression.arguments()]
+            node = PlanNode(key, expression, children)
+            self.nodes.append(node)
+        self._keys[key] = node
+        return node
+
+    def inline(self, expression):
+        '''Expand a composite function into its template.'''
+        if (isinstance(expression, Function) and
+                isinstance(expression.func, CompositeBase)):
+            return expression.func.inline(*self.split(expression))
+
+    def split(self, function):
+        '''Split the arguments of a :class:`~.Function` expression into a
+        list of positional :class:`~.Expr` and a dictionary of parameters.'''
+        value = function.value
+        items = value if isinstance(value, ConcatenationOp) else (value,)
+        args = []
+        kwargs = {}
+        for item in items:
+            if isinstance(item, EqualOp):
+                kwargs[str(item.left)] = item.right
+            else:
+                args.append(item)
+        return args, kwargs
+
+    def lookback(self):
+        '''Dictionary mapping each symbol to the number of observations,
+        before the first date of the results, required to evaluate the
+        expressions. It is obtained from the
+        :meth:`~.FunctionBase.lookback` of the functions applied to each
+        symbol, including the functions in composites.'''
+        lookbacks = {}
+        for node in self.nodes:
+            expression = node.expression
+            if isinstance(expression, Symbol):
+                lookbacks[node] = {expression.value: 0}
+                continue
+            value = {}
+            for child in node.children:
+                for symbol, n in lookbacks[child].items():
+                    value[symbol] = max(value.get(symbol, 0), n)
+            if isinstance(expression, Function) and value:
+                _, kwargs = self.split(expression)
+                params = dict(((k, v.value) for k, v in kwargs.items()
+                               if isinstance(v, Number)))
+                n = expression.func.lookback(**params)
+                value = dict(((s, v + n) for s, v in value.items()))
+            lookbacks[node] = value
+        result = {}
+        for root in self.roots:
+            for symbol, n in lookbacks[root].items():
+                result[symbol] = max(result.get(symbol, 0), n)
+        return result
+
+    def symbols(self):
+        '''List of symbols required by all expressions in the plan.'''
+        symbols = []
+        for expression in self.expressions:
+            for symbol in expression.symbols() or ():
+                if symbol not in symbols:
+                    symbols.append(symbol)
+        return symbols
+
+    def consumers(self):
+        '''Dictionary mapping each :class:`PlanNode` to the list of
+        nodes which use its result.'''
+        consumers = dict(((node, []) for node in self.nodes))
+        for node in self.nodes:
+            for child in set(node.children):
+                consumers[child].append(node)
+        return consumers
+
+    def unwind(self, values, backend, executor=None, profile=None):
+        '''Evaluate all nodes in the plan and return a list with the
+        result of each expression.
+
+        :parameter values: dictionary of symbols data.
+        :parameter backend: :class:`dynts.TimeSeries` backend name.
+        :parameter executor: optional :class:`concurrent.futures.Executor`
+            or number of threads. If provided, nodes which do not depend
+            on each other are evaluated concurrently, otherwise nodes are
+            evaluated one after the other in topological order.
+        :parameter profile: optional :class:`~.Profile` collecting the
+            statistics of each node.
+
+        Each call uses a new :class:`EvaluationContext`, therefore the same
+        plan can be evaluated concurrently with different *values*.
+        '''
+        with EvaluationContext(self, values, backend, profile) as context:
+            return context.run(executor)
+
+
+class EvaluationContext:
+    '''The state of a single evaluation of an :class:`ExpressionPlan`.
+
+    Results of intermediate nodes are stored in the context, not in the
+    expression tree, and are released as soon as the last node consuming
+    them has been evaluated. Nodes supporting it can overwrite the
+    intermediate timeseries they are the last consumer of, check
+    :meth:`owned`. The context is cleared on exit.
+
+    .. attribute:: results
+
+        Dictionary of results keyed by :attr:`PlanNode.key`.
+
+    .. attribute:: peak
+
+        Maximum number of results held at the same time.
+
+    .. attribute:: profile
+
+        Optional :class:`~.Profile` collecting node statistics.
+    '''
+    def __init__(self, plan, values, backend, profile=None):
+        self.plan = plan
+        self.values = values
+        self.backend = backend
+        self.profile = profile
+        self.results = {}
+        self.peak = 0
+        self._consumers = plan.consumers()
+        self._pending = dict(((node, len(consumers)) for node, consumers
+                              in self._consumers.items()))
+        self._roots = set(plan.roots)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.results.clear()
+
+    def run(self, executor=None):
+        '''Evaluate the plan and return the list of results of
+        :attr:`ExpressionPlan.roots`.'''
+        if executor is None:
+            for node in self.plan.nodes:
+                self.done(node, *self.evaluate(node))
+        elif isinstance(executor, int):
+            with ThreadPoolExecutor(executor) as pool:
+                self._run_concurrent(pool)
+        else:
+            self._run_concurrent(executor)
+        return [self.results[root.key] for root in self.plan.roots]
+
+    def inputs(self, node):
+        return [self.results[c.key] for c in node.children]
+
+    def owned(self, node, inputs):
+        '''``True`` if *node* can overwrite the timeseries in *inputs*.
+        This is the case when the node supports it and the timeseries are
+        intermediate results, not symbols data or results of the plan,
+        consumed by *node* only.'''
+        if (not node.expression.inplace or
+                len(set(node.children)) != len(node.children)):
+            return False
+        for child, value in zip(node.children, inputs):
+            if is_timeseries(value) and (
+                    child in self._roots or self._pending[child] != 1 or
+                    isinstance(child.expression, Symbol)):
+                return False
+        return True
+
+    def evaluate(self, node):
+        return self.execute(node, self.inputs(node))
+
+    def execute(self, node, inputs):
+        '''Evaluate *node* with *inputs* and return a two-elements tuple
+        with the result and its statistics, if profiling.'''
+        inplace = self.owned(node, inputs)
+        if self.profile is None:
+            value = node.evaluate(self.values, self.backend, inputs, inplace)
+            return value, None
+        return self.profile.run(node, self.values, self.backend, inputs,
+                                inplace)
+
+    def done(self, node, value, stats=None):
+        '''Store the *value* of *node* and release the results no
+        longer needed.'''
+        self.results[node.key] = value
+        if stats is not None:
+            self.profile.nodes[node.key] = stats
+        self.peak = max(self.peak, len(self.results))
+        for child in set(node.children):
+            self._pending[child] -= 1
+            if not self._pending[child] and child not in self._roots:
+                self.results.pop(child.key)
+
+    def _run_concurrent(self, executor):
+        # Nodes are submitted to the executor as soon as all their children
+        # are available. Results are only handled by the calling thread.
+        waiting = dict(((node, len(set(node.children)))
+                        for node in self.plan.nodes))
+        running = {}
+
+        def submit(node):
+            future = executor.submit(self.execute, node, self.inputs(node))
+            running[future] = node
+
+        for node in self.plan.nodes:
+            if not waiting[node]:
+                submit(node)
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    self.done(node, *future.result())
+                    for consumer in self._consumers[node]:
+                        waiting[consumer] -= 1
+                        if not waiting[consumer]:
+                            submit(consumer)
+        except Exception:
+            for future in running:
+                future.cancel()
+            raise
@@ -0,0 +1,201 @@
+'''Profiling of expression evaluation.
+
+A :class:`Profile` collects, for each :class:`~.PlanNode` of an
+:class:`~.ExpressionPlan`, the wall time spent evaluating the node, the
+shapes of its inputs and output, the bytes of its output and the kernels
+which were used (from the ``cts`` extension or the pure Python
+``fallback``). It is obtained via ``evaluate(..., profile=True)`` or
+:meth:`~.DSLResult.explain`.
+
+Bytes of the timeseries built by symbol nodes from the loaded data are
+attributed to loading, check :attr:`Profile.load_bytes`.
+'''
+import json
+from time import perf_counter
+
+import numpy as np
+
+from ..api.timeseries import is_timeseries
+from .. import lib
+from .ast import Symbol
+
+
+def shape(value):
+    '''The shape of an evaluated *value*.'''
+    if is_timeseries(value):
+        return tuple(value.shape)
+    elif isinstance(value, (list, tuple)):
+        return [shape(v) for v in value]
+    elif isinstance(value, dict):
+        return dict(((k, shape(v)) for k, v in value.items()))
+
+
+def arrays(value):
+    '''Generator over the arrays of keys and values of an evaluated
+    *value*.'''
+    if is_timeseries(value):
+        for v in (value.keys(), value.values()):
+            if isinstance(v, np.ndarray):
+                yield v
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from arrays(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from arrays(v)
+
+
+def nbytes(value, inputs=()):
+    '''Number of bytes held by the arrays of an evaluated *value*.
+    Arrays sharing memory with the arrays of *inputs*, such as the keys
+    of element-wise operations, are not counted.'''
+    shared = list(arrays(inputs))
+    return sum((v.nbytes for v in arrays(value)
+                if not any((np.may_share_memory(v, s) for s in shared))))
+
+
+class NodeProfile:
+    '''Statistics of the evaluation of a :class:`~.PlanNode`.
+
+    .. attribute:: time
+
+        Wall time, in seconds, spent evaluating the node, excluding its
+        children.
+
+    .. attribute:: inputs
+
+        List of shapes of the node inputs.
+
+    .. attribute:: output
+
+        Shape of the node output.
+
+    .. attribute:: bytes
+
+        Bytes allocated for the node output, excluding arrays shared
+        with its inputs and loaded data.
+
+    .. attribute:: kernels
+
+        List of ``(name, implementation)`` pairs of the kernels used.
+
+    .. attribute:: loaded
+
+        Bytes of loaded data held by the output of a symbol node.
+    '''
+    __slots__ = ('time', 'inputs', 'output', 'bytes', 'kernels', 'loaded')
+
+    def __init__(self, time, inputs, output, bytes, kernels, loaded=0):
+        self.time = time
+        self.inputs = inputs
+        self.output = output
+        self.bytes = bytes
+        self.kernels = kernels
+        self.loaded = loaded
+
+    def as_dict(self):
+        return {'time': self.time,
+                'inputs': self.inputs,
+                'output': self.output,
+                'bytes': self.bytes,
+                'loaded': self.loaded,
+                'kernels': ['%s (%s)' % k for k in self.kernels]}
+
+
+class Profile:
+    '''Profile of the evaluation of an :class:`~.ExpressionPlan`.
+
+    .. attribute:: plan
+
+        The :class:`~.ExpressionPlan` profiled.
+
+    .. attribute:: load_time
+
+        Wall time, in seconds, spent loading data, or ``None``.
+
+    .. attribute:: nodes
+
+        Dictionary of :class:`NodeProfile` keyed by :attr:`~.PlanNode.key`.
+    '''
+    def __init__(self, plan, load_time=None):
+        self.plan = plan
+        self.load_time = load_time
+        self.nodes = {}
+
+    def __repr__(self):
+        return self.tree()
+
+    def __str__(self):
+        return self.__repr__()
+
+    @property
+    def time(self):
+        '''Total wall time spent evaluating nodes.'''
+        return sum((n.time for n in self.nodes.values()))
+
+    @property
+    def load_bytes(self):
+        '''Bytes of loaded data held by the symbol nodes.'''
+        return sum((n.loaded for n in self.nodes.values()))
+
+    def run(self, node, values, backend, inputs, inplace=False):
+        '''Evaluate *node* and return a two-elements tuple containing the
+        result and its :class:`NodeProfile`.'''
+        shapes = [shape(v) for v in inputs]
+        with lib.trace_kernels() as kernels:
+            start = perf_counter()
+            value = node.evaluate(values, backend, inputs, inplace)
+            elapsed = perf_counter() - start
+        size = nbytes(value, inputs)
+        if isinstance(node.expression, Symbol):
+            stats = NodeProfile(elapsed, shapes, shape(value), 0, kernels,
+                                size)
+        else:
+            stats = NodeProfile(elapsed, shapes, shape(value), size, kernels)
+        return value, stats
+
+    def as_dict(self):
+        '''A JSON-serializable dictionary with the profile of each
+        expression in the plan, as a tree.'''
+        return {'load_time': self.load_time,
+                'load_bytes': self.load_bytes,
+                'time': self.time,
+                'expressions': [self._node_dict(r) for r in self.plan.roots]}
+
+    def json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def tree(self):
+        '''A string representation of the plan as a tree, with the
+        statistics of each node.'''
+        lines = []
+        if self.load_time is not None:
+            lines.append('load: %.3f ms, %s bytes' % (1000*self.load_time,
+                                                      self.load_bytes))
+        for root in self.plan.roots:
+            self._node_lines(root, 0, lines)
+        return '\n'.join(lines)
+
+    def _node_dict(self, node):
+        data = {'expression': str(node.expression),
+                'type': node.expression.type}
+        stats = self.nodes.get(node.key)
+        if stats is not None:
+            data.update(stats.as_dict())
+        data['children'] = [self._node_dict(c) for c in node.children]
+        return data
+
+    def _node_lines(self, node, level, lines):
+        line = '%s%s [%s]' % ('  '*level, node.expression,
+                              node.expression.type)
+        stats = self.nodes.get(node.key)
+        if stats is not None:
+            line = '%s %.3f ms, in %s, out %s, %s bytes' % (
+                line, 1000*stats.time, stats.inputs, stats.output,
+                stats.bytes)
+            if stats.kernels:
+                line = '%s, kernels %s' % (
+                    line, ', '.join(('%s (%s)' % k for k in stats.kernels)))
+        lines.append(line)
+        for child in node.children:
+            self._node_lines(child, level+1, lines)
@@ -1,9 +1,20 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+
 from ply import yacc, lex
 
 from .grammar import *  # noqa
 from ..conf import settings
 
 
+# Parse tables shipped with the package. They are generated for the
+# default SLR method, other methods build their tables in memory.
+TABMODULE = 'parsetab'
+DEFAULT_METHOD = 'SLR'
+MAX_CACHED_PARSERS = 32
+
+
 class Rules:
 
     # Regular expression rules for simple tokens
@@ -23,6 +34,8 @@ class Rules:
     def __init__(self, oper=None):
         self.lexer = None
         self.oper = oper or {}
+        self.t_CONCAT = r'\%s' % settings.concat_operator
+        self.t_SPLIT = r'\%s' % settings.separator_operator
 
     def reserved(self):
         return {}
@@ -108,12 +121,174 @@ class Rules:
         self.lexer.input(data)
 
 
-def parsefunc(timeseries_expression, functions, method, debug):
-    ru = Rules(functions)
-    ru.build()
-    ru.input(timeseries_expression)
+class CompiledParser:
+    '''A lexer and a yacc parser built once and shared by all
+    expressions parsed with the same functions and operators.
+    '''
+    def __init__(self, functions, method):
+        self.rules = Rules(functions)
+        self.rules.build()
+        self.parser = grammar_parser(self.rules, method)
+        self.lock = Lock()
+
+    def parse(self, timeseries_expression, debug=False):
+        lexer = self.rules.lexer.clone()
+        with self.lock:
+            return self.parser.parse(timeseries_expression, lexer=lexer,
+                                     debug=debug)
+
+
+class ParserCache(dict):
+    '''Process-wide cache of :class:`CompiledParser`.
+
+    Parsers are keyed on the functions contents, the operators in
+    :class:`dynts.conf.Settings` and the parsing method. Entries
+    compiled for an older version of a
+    :class:`dynts.dsl.functions.registry.FunctionRegistry` are dropped
+    as soon as the registry changes.
+    '''
+    def __init__(self, maxsize=MAX_CACHED_PARSERS):
+        super().__init__()
+        self.maxsize = maxsize
+        self.lock = Lock()
+
+    def key(self, functions, method=None):
+        '''The cache key for *functions* and *method*'''
+        return (self.functions_key(functions),
+                (method or DEFAULT_METHOD).upper(),
+                settings.concat_operator, settings.separator_operator)
+
+    def get_parser(self, functions, method=None, key=None):
+        key = key or self.key(functions, method)
+        parser = self.get(key)
+        if parser is None:
+            with self.lock:
+                parser = self.get(key)
+                if parser is None:
+                    self.invalidate(functions)
+                    while len(self) >= self.maxsize:
+                        self.pop(next(iter(self)))
+                    parser = CompiledParser(functions, key[1])
+                    self[key] = parser
+        return parser
+
+    def functions_key(self, functions):
+        version = getattr(functions, 'version', None)
+        if version is None:
+            return ('dict',) + tuple(sorted(functions.items(),
+                                            key=lambda f: f[0]))
+        else:
+            return 'registry', id(functions), version
+
+    def invalidate(self, functions):
+        '''Remove parsers compiled for an old version of *functions*'''
+        if getattr(functions, 'version', None) is not None:
+            fid = id(functions)
+            for key in tuple(self):
+                kind, *registry = key[0]
+                if (kind == 'registry' and registry[0] == fid and
+                        registry[1] != functions.version):
+                    self.pop(key, None)
+
+
+class ExpressionCache(OrderedDict):
+    '''Least recently used cache of parsed :class:`dynts.dsl.Expr`.
+
+    Expressions are keyed on the normalized expression string and on the
+    :class:`ParserCache` key used to parse them, so that a change in the
+    function registry never returns a stale tree. The cache keeps pristine
+    trees and returns a :meth:`dynts.dsl.Expr.copy` on every hit.
+
+    .. attribute:: maxsize
+
+        Maximum number of expressions in the cache. If ``None`` the
+        :attr:`dynts.conf.Settings.expression_cache_size` is used.
+
+    .. attribute:: hits
+
+        Number of expressions found in the cache.
+
+    .. attribute:: misses
+
+        Number of expressions parsed because not in the cache.
+    '''
+    def __init__(self, maxsize=None):
+        super().__init__()
+        self._maxsize = maxsize
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is None:
+            return settings.expression_cache_size
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        self._maxsize = value
+
+    def get_expression(self, key, parse):
+        '''Return a copy of the expression at *key*. If not available
+        call *parse* and store its result.'''
+        maxsize = self.maxsize
+        if not maxsize:
+            return parse()
+        with self.lock:
+            expression = self.get(key)
+            if expression is not None:
+                self.move_to_end(key)
+                self.hits += 1
+                return expression.copy()
+            self.misses += 1
+        expression = parse()
+        if expression is not None:
+            with self.lock:
+                self[key] = expression.copy()
+                while len(self) > maxsize:
+                    self.popitem(last=False)
+        return expression
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+            self.hits = 0
+            self.misses = 0
+
+
+parsers = ParserCache()
+expressions = ExpressionCache()
+
+
+def grammar_parser(rules, method, write_tables=False):
+    '''Build the yacc parser for *method*.
+
+    The SLR tables are read from the ``parsetab`` module shipped with the
+    package and regenerated in memory only when the grammar changes.
+    Pass ``write_tables=True`` to refresh the shipped module.
+    '''
     # Important! needed by yacc
-    tokens = ru.tokens              # noqa
-    precedence = ru.precedence      # noqa
-    p = yacc.yacc(method=method or 'SLR')
-    return p.parse(lexer=ru.lexer, debug=debug)
+    tokens = rules.tokens              # noqa
+    precedence = rules.precedence      # noqa
+    if method == DEFAULT_METHOD:
+        tabmodule = TABMODULE
+    else:
+        tabmodule = '%s_%s' % (TABMODULE, method.lower())
+        write_tables = False
+    return yacc.yacc(method=method,
+                     tabmodule=tabmodule,
+                     outputdir=os.path.dirname(__file__),
+                     write_tables=write_tables,
+                     debug=False)
+
+
+def parsefunc(timeseries_expression, functions, method, debug):
+    timeseries_expression = timeseries_expression.strip()
+    key = parsers.key(functions, method)
+    parser = parsers.get_parser(functions, key=key)
+    if debug:
+        return parser.parse(timeseries_expression, debug=debug)
+    return expressions.get_expression(
+        (key, timeseries_expression),
+        lambda: parser.parse(timeseries_expression))
@@ -1,9 +1,44 @@
+import threading
+from contextlib import contextmanager
+
 from .cts import *      # noqa
 from . import defaults  # noqa
 from . import fallback
 
 
+_traces = threading.local()
+
+
 def make_skiplist(*args, use_fallback=False):
     '''Create a new skiplist'''
     sl = fallback.Skiplist if use_fallback else Skiplist
     return sl(*args)
+
+
+def kernel(name, use_fallback=False):
+    '''Return the kernel function *name* from the ``cts`` extension, or from
+    the pure Python ``fallback`` module if *use_fallback* is ``True`` or the
+    extension does not provide it. The implementation is recorded by the
+    active :func:`trace_kernels` of the calling thread, if any.'''
+    func = None if use_fallback else globals().get(name)
+    implementation = 'cts'
+    if func is None:
+        func = getattr(fallback, name)
+        implementation = 'fallback'
+    kernels = getattr(_traces, 'kernels', None)
+    if kernels is not None:
+        kernels.append((name, implementation))
+    return func
+
+
+@contextmanager
+def trace_kernels():
+    '''Context manager yielding a list of ``(name, implementation)`` pairs,
+    one for each :func:`kernel` requested by the calling thread within
+    the context.'''
+    previous = getattr(_traces, 'kernels', None)
+    _traces.kernels = kernels = []
+    try:
+        yield kernels
+    finally:
+        _traces.kernels = previous
@@ -1,5 +1,7 @@
 #
 # Defaults
+import numpy as np
+
 from ..api.timeseries import TimeSeries
 
 
@@ -21,4 +23,141 @@ def simple_reduce(ts, size, align='right'):
     return ts.clone(dates, values)
 
 
+def _previous(mask):
+    # Position of the last valid value at or before each row, -1 if none
+    index = np.arange(len(mask)).reshape(len(mask), 1)
+    return np.maximum.accumulate(np.where(mask, -1, index), axis=0)
+
+
+def _next(mask):
+    # Position of the first valid value at or after each row, N if none
+    N = len(mask)
+    index = np.arange(N).reshape(N, 1)
+    nxt = np.where(mask, N, index)[::-1]
+    return np.minimum.accumulate(nxt, axis=0)[::-1]
+
+
+def _fill(ts, values, fill, limit):
+    # Replace missing *values* where *fill* is True and within *limit*
+    if limit is not None:
+        fill &= limit
+    values = np.where(fill, values, ts.values())
+    return ts.clone(date=ts.keys(), data=values)
+
+
+def default_clean(ts):
+    '''Remove dates at which a series has a missing value between its first
+    and last valid values, and dates at which all series are missing.'''
+    values = ts.values()
+    if not len(values):
+        return ts.clone()
+    mask = np.isnan(values)
+    N = len(mask)
+    index = np.arange(N).reshape(N, 1)
+    valid = ~mask
+    # a series without valid values spans all dates
+    first = np.where(valid.any(axis=0), valid.argmax(axis=0), 0)
+    last = np.where(valid.any(axis=0), N - 1 - valid[::-1].argmax(axis=0),
+                    N - 1)
+    inside = (index >= first) & (index <= last)
+    keep = valid.any(axis=1) & ~(mask & inside).any(axis=1)
+    return ts.clone(date=ts.keys()[keep], data=values[keep])
+
+
+def dropany_clean(ts):
+    '''Remove dates at which any series has a missing value.'''
+    values = ts.values()
+    if not len(values):
+        return ts.clone()
+    keep = ~np.isnan(values).any(axis=1)
+    return ts.clone(date=ts.keys()[keep], data=values[keep])
+
+
+def dropall_clean(ts):
+    '''Remove dates at which all series have a missing value.'''
+    values = ts.values()
+    if not len(values):
+        return ts.clone()
+    keep = ~np.isnan(values).all(axis=1)
+    return ts.clone(date=ts.keys()[keep], data=values[keep])
+
+
+def ffill_clean(ts, limit=None):
+    '''Replace missing values with the last valid value. If *limit* is
+    given, at most *limit* consecutive missing values are replaced.'''
+    values = ts.values()
+    if not len(values):
+        return ts.clone()
+    mask = np.isnan(values)
+    previous = _previous(mask)
+    found = previous >= 0
+    filled = np.take_along_axis(values, np.where(found, previous, 0), axis=0)
+    distance = np.arange(len(mask)).reshape(len(mask), 1) - previous
+    return _fill(ts, filled, mask & found,
+                 None if limit is None else distance <= limit)
+
+
+def bfill_clean(ts, limit=None):
+    '''Replace missing values with the next valid value. If *limit* is
+    given, at most *limit* consecutive missing values are replaced.'''
+    values = ts.values()
+    if not len(values):
+        return ts.clone()
+    mask = np.isnan(values)
+    N = len(mask)
+    nxt = _next(mask)
+    found = nxt < N
+    filled = np.take_along_axis(values, np.where(found, nxt, 0), axis=0)
+    distance = nxt - np.arange(N).reshape(N, 1)
+    return _fill(ts, filled, mask & found,
+                 None if limit is None else distance <= limit)
+
+
+def _interpolate(ts, x, limit):
+    values = ts.values()
+    mask = np.isnan(values)
+    N = len(mask)
+    previous = _previous(mask)
+    nxt = _next(mask)
+    found = (previous >= 0) & (nxt < N)
+    p = np.where(found, previous, 0)
+    n = np.where(found, nxt, 0)
+    v0 = np.take_along_axis(values, p, axis=0)
+    v1 = np.take_along_axis(values, n, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = (x.reshape(N, 1) - x[p]) / (x[n] - x[p])
+        filled = v0 + weight*(v1 - v0)
+    distance = np.arange(N).reshape(N, 1) - previous
+    return _fill(ts, filled, mask & found,
+                 None if limit is None else distance <= limit)
+
+
+def linear_clean(ts, limit=None):
+    '''Replace missing values between two valid values by linear
+    interpolation, assuming equally spaced dates. If *limit* is given, at
+    most *limit* consecutive missing values are replaced.'''
+    if not ts:
+        return ts.clone()
+    return _interpolate(ts, np.arange(len(ts), dtype=float), limit)
+
+
+def time_clean(ts, limit=None):
+    '''Replace missing values between two valid values by linear
+    interpolation weighted by the distance between dates. If *limit* is
+    given, at most *limit* consecutive missing values are replaced.'''
+    if not ts:
+        return ts.clone()
+    keys = np.asarray(ts.keys())
+    if keys.dtype.kind == 'M':
+        keys = keys.view('int64')
+    return _interpolate(ts, keys.astype(float), limit)
+
+
 TimeSeries.register_algorithm('reduce', 'simple', simple_reduce)
+TimeSeries.register_algorithm('clean', 'default', default_clean)
+TimeSeries.register_algorithm('clean', 'dropany', dropany_clean)
+TimeSeries.register_algorithm('clean', 'dropall', dropall_clean)
+TimeSeries.register_algorithm('clean', 'ffill', ffill_clean)
+TimeSeries.register_algorithm('clean', 'bfill', bfill_clean)
+TimeSeries.register_algorithm('clean', 'linear', linear_clean)
+TimeSeries.register_algorithm('clean', 'time', time_clean)
@@ -6,6 +6,15 @@ from .operators import (
     roll_mean,
     roll_sd,
     roll_sharpe,
+    roll_moments,
+    roll2d,
+    roll2d_extreme,
+    roll2d_max,
+    roll2d_min,
+    roll2d_median,
+    roll2d_mean,
+    roll2d_sd,
+    roll2d_sharpe,
     rollingOperation,
 )
 from .dates import jstimestamp
@@ -19,6 +28,15 @@ __all__ = [
     'roll_mean',
     'roll_sd',
     'roll_sharpe',
+    'roll_moments',
+    'roll2d',
+    'roll2d_extreme',
+    'roll2d_max',
+    'roll2d_min',
+    'roll2d_median',
+    'roll2d_mean',
+    'roll2d_sd',
+    'roll2d_sharpe',
     'rollingOperation',
     'jstimestamp'
 ]
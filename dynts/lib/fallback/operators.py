@@ -9,14 +9,14 @@ from .common import *
 from .skiplist import Skiplist
 
 
-def roll_max(iterable, window, skiplist_class=None):
-    return rollingOperation(iterable, window, smax,
-                            skiplist_class=skiplist_class)
+def roll_max(input, window):
+    return roll2d_max(np.asarray(input, dtype=float).reshape(-1, 1),
+                      window)[:, 0]
 
 
-def roll_min(iterable, window, skiplist_class=None):
-    return rollingOperation(iterable, window, smin,
-                            skiplist_class=skiplist_class)
+def roll_min(input, window):
+    return roll2d_min(np.asarray(input, dtype=float).reshape(-1, 1),
+                      window)[:, 0]
 
 
 def roll_median(iterable, window, skiplist_class=None):
@@ -107,81 +107,160 @@ This is a simple rolling aggregation.'''
     return output
 
 
-def roll_sd(input, window, scale = 1.0, ddof = 0):
-    '''Apply a rolling standard deviation function
-to an array. This is a simple rolling aggregation of squared
-sums.'''
-    nobs, i, j, sx, sxx = 0,0,0,0.,0.
-    N = len(input)
-    sqrt = np.sqrt
+def kahan_add(total, comp, value):
+    '''Add *value* to *total* with Kahan compensation *comp*. Return the
+new ``(total, comp)`` pair.'''
+    y = value - comp
+    t = total + y
+    return t, (t - total) - y
+
 
+def moments(values):
+    '''The ``(nobs, mean, m2)`` tuple of the non missing *values*,
+computed with the corrected two-pass algorithm.'''
+    nobs, total = 0, 0.
+    for v in values:
+        if v == v:
+            nobs += 1
+            total += v
+    if not nobs:
+        return 0, 0., 0.
+    mean = total / nobs
+    m2, comp = 0., 0.
+    for v in values:
+        if v == v:
+            delta = v - mean
+            m2 += delta * delta
+            comp += delta
+    return nobs, mean + comp / nobs, max(m2 - comp * comp / nobs, 0.)
+
+
+def roll_moments(input, window):
+    '''Generator of rolling ``(nobs, mean, m2)`` tuples, where ``m2`` is
+the sum of squared deviations from the mean of the non missing values in
+the window. It uses Welford updates accumulated with Kahan compensation,
+which do not lose precision when values are large compared to their
+variations, and recomputes the moments from scratch every *window*
+observations so that rounding errors do not accumulate.'''
+    N = len(input)
     if window > N:
         raise ValueError('Out of bound')
-
-    output = np.ndarray(N-window+1,dtype=input.dtype)
-
-    for val in input[:window]:
+    nobs, mean, m2, cmean, cm2 = 0, 0., 0., 0., 0.
+    for i in range(N):
+        if i >= window:
+            prev = input[i-window]
+            if prev == prev:
+                nobs -= 1
+                if nobs > 1:
+                    delta = prev - mean
+                    mean, cmean = kahan_add(mean, cmean, -delta / nobs)
+                    m2, cm2 = kahan_add(m2, cm2, -delta * (prev - mean))
+                    if m2 < 0:
+                        m2, cm2 = 0., 0.
+                else:
+                    # restart from the remaining observation, if any
+                    mean, m2, cmean, cm2 = 0., 0., 0., 0.
+                    for v in input[i-window+1:i]:
+                        if v == v:
+                            mean = float(v)
+        val = input[i]
         if val == val:
             nobs += 1
-            sx += val
-            sxx += val*val
-
-    nn = nobs - ddof
-    output[j] = NaN if nn<=0 else sqrt(scale * (sxx - sx*sx/nobs) / nn)
+            delta = val - mean
+            mean, cmean = kahan_add(mean, cmean, delta / nobs)
+            m2, cm2 = kahan_add(m2, cm2, delta * (val - mean))
+        j = i - window + 1
+        if j >= 0:
+            if not j % window:
+                nobs, mean, m2 = moments(input[j:i+1])
+                cmean, cm2 = 0., 0.
+            yield nobs, mean, max(m2, 0.)
+
+
+def roll_sd(input, window, scale=1.0, ddof=0):
+    '''Apply a rolling standard deviation function
+to an array, ``sqrt(scale * var)`` where ``var`` is the variance with
+*ddof* delta degrees of freedom.'''
+    output = np.empty(max(len(input)-window+1, 0))
+    for j, (nobs, mean, m2) in enumerate(roll_moments(input, window)):
+        nn = nobs - ddof
+        output[j] = NaN if nn <= 0 else np.sqrt(scale * m2 / nn)
+    return output
 
-    for val in input[window:]:
-        prev = input[j]
-        if prev == prev:
-            sx -= prev
-            sxx -= prev*prev
-            nobs -= 1
 
-        if val == val:
-            nobs += 1
-            sx += val
-            sxx += val*val
+def roll_sharpe(input, window, scale=1.0):
+    '''Apply a rolling sharpe ratio function to an array, the mean
+divided by the root mean square of the values in the window, times
+``sqrt(scale)``.'''
+    output = np.empty(max(len(input)-window+1, 0))
+    for j, (nobs, mean, m2) in enumerate(roll_moments(input, window)):
+        rms = m2 / nobs + mean*mean if nobs else 0
+        output[j] = NaN if not rms else mean * np.sqrt(scale / rms)
+    return output
 
-        j += 1
-        nn = nobs - ddof
-        output[j] = NaN if nn<=0 else sqrt(scale * (sxx - sx*sx/nobs) / nn)
 
+def roll2d(func, input, window, *args):
+    '''Apply the rolling function *func* to each column of the
+two-dimensional array *input* and return a single
+``(N-window+1, K)`` array.'''
+    N, K = input.shape
+    if window < 1 or window > N:
+        raise ValueError('Out of bound')
+    output = np.empty((N-window+1, K))
+    for k in range(K):
+        output[:, k] = np.fromiter(func(input[:, k], window, *args),
+                                   dtype=float, count=N-window+1)
     return output
 
 
-def roll_sharpe(input, window, scale = 1.0):
-    '''Apply a rolling mean function to an array.
-This is a simple rolling aggregation.'''
-    nobs, i, j, sx, sxx = 0,0,0,0.,0.
-    N = len(input)
-    sqrt = np.sqrt
+def roll2d_extreme(input, window, op):
+    '''Rolling maximum or minimum, according to the ufunc *op*, of each
+column of *input*. Missing values are ignored.
 
-    if window > N:
+It uses the van Herk/Gil-Werman algorithm: rows are split into blocks of
+*window* rows and the extreme of each window is obtained from the
+running extreme to the end of one block and from the start of the
+next one, both computed with ``op.accumulate``. It performs a constant
+number of vectorized operations per row.'''
+    input = np.asarray(input, dtype=float)
+    N, K = input.shape
+    if window < 1 or window > N:
         raise ValueError('Out of bound')
+    empty = -np.inf if op is np.maximum else np.inf
+    missing = np.isnan(input)
+    blocks = -(-N // window)
+    data = np.full((blocks*window, K), empty)
+    data[:N] = np.where(missing, empty, input)
+    data = data.reshape(blocks, window, K)
+    prefix = op.accumulate(data, axis=1).reshape(-1, K)
+    suffix = op.accumulate(data[:, ::-1], axis=1)[:, ::-1].reshape(-1, K)
+    output = op(suffix[:N-window+1], prefix[window-1:N])
+    # windows without observations
+    count = np.zeros((N+1, K), dtype=int)
+    np.cumsum(~missing, axis=0, out=count[1:])
+    output[count[window:] == count[:-window]] = NaN
+    return output
 
-    output = np.ndarray(N-window+1,dtype=input.dtype)
 
-    for val in input[:window]:
-        if val == val:
-            nobs += 1
-            sx += val
-            sxx += val*val
+def roll2d_max(input, window):
+    return roll2d_extreme(input, window, np.maximum)
 
-    output[j] = NaN if not nobs else sx * sqrt(scale / ( nobs * sxx ))
 
-    for val in input[window:]:
-        prev = input[j]
-        if prev == prev:
-            sx -= prev
-            sxx -= prev*prev
-            nobs -= 1
+def roll2d_min(input, window):
+    return roll2d_extreme(input, window, np.minimum)
 
-        if val == val:
-            nobs += 1
-            sx += val
-            sxx += val*val
 
-        j += 1
+def roll2d_median(input, window):
+    return roll2d(roll_median, input, window)
 
-        output[j] = NaN if not nobs else sx * sqrt(scale / ( nobs * sxx ))
 
-    return output
+def roll2d_mean(input, window):
+    return roll2d(roll_mean, input, window)
+
+
+def roll2d_sd(input, window, scale=1.0, ddof=0):
+    return roll2d(roll_sd, input, window, scale, ddof)
+
+
+def roll2d_sharpe(input, window, scale=1.0):
+    return roll2d(roll_sharpe, input, window, scale)
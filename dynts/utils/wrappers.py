@@ -1,9 +1,7 @@
-from bisect import bisect_left, bisect_right
-
-from numpy import ndarray
+from numpy import ndarray, searchsorted
 
 from ..conf import settings
-from ..exc import DateNotFound, OutOfBound, RightOutOfBound
+from ..exc import DateNotFound, LeftOutOfBound, OutOfBound, RightOutOfBound
 from .section import asarray
 
 
@@ -52,7 +50,7 @@ has a shortcut method which construct a ``asbtree``. Here is an example::
 '''
     def wrap(self):
         ts = self.ts
-        self.dates  = asarray(ts.dates())
+        self.dates  = asarray(ts.keys())
         self.values = ts.values()
 
     def __len__(self):
@@ -65,7 +63,7 @@ an :class:`dynts.exceptions.DateNotFound`.'''
             index = self.find_ge(dt)
         except OutOfBound:
             raise DateNotFound
-        if self.dates[index] == dt:
+        if self.dates[index] == self.ts.dateconvert(dt):
             return self.values[index]
         else:
             raise DateNotFound
@@ -82,7 +80,7 @@ If *dt* is greater than the
 exception will raise.
 
 *dt* must be a python datetime.date instance.'''
-        i = bisect_left(self.dates, dt)
+        i = searchsorted(self.dates, self.ts.dateconvert(dt), 'left')
         if i != len(self.dates):
             return i
         raise RightOutOfBound
@@ -95,7 +93,7 @@ a :class:`dynts.exceptions.LeftOutOfBound`
 exception will raise.
 
 *dt* must be a python datetime.date instance.'''
-        i = bisect_right(self.dates, dt)
+        i = searchsorted(self.dates, self.ts.dateconvert(dt), 'right')
         if i:
             return i-1
         raise LeftOutOfBound
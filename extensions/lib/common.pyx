@@ -6,7 +6,7 @@ from numpy cimport *
 cdef extern from "numpy/arrayobject.h":
     void import_array()
 
-cdef extern from "math.h":
+cdef extern from "math.h" nogil:
     double log(double x)
     double sqrt(double x)
 
@@ -22,6 +22,6 @@ cdef inline int int_max(int a, int b): return a if a >= b else b
 cdef inline int int_min(int a, int b): return a if a >= b else b
 
 # MSVC does not have log2!
-cdef inline double Log2(double x):
+cdef inline double Log2(double x) nogil:
     return log(x) / clog2
 
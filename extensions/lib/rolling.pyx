@@ -1,128 +1,343 @@
 
 #-------------------------------------------------------------------------------
-# Rolling median, min, max
+# Two-dimensional rolling kernels
+#
+# Kernels take a (N, K) array of doubles, C or F contiguous or strided, and
+# write the rolling statistic of all K columns into a single preallocated
+# (N-window+1, K) output. One-dimensional kernels are views of them.
+
+cdef ndarray _roll2d_output(input, int window):
+    if input.ndim != 2:
+        raise ValueError('Two-dimensional array required.')
+    if window < 1 or window > input.shape[0]:
+        raise ValueError('Rolling operation not possible.')
+    return np.empty((input.shape[0] - window + 1, input.shape[1]),
+                    dtype=float)
+
+
+def _roll1d(kernel, input, int window, *args):
+    input = np.asarray(input, dtype=float)
+    return kernel(input.reshape(len(input), 1), window, *args)[:, 0]
+
+
+#-------------------------------------------------------------------------------
+# Rolling median
 
 # Pointer to a function operating on a Skiplist
-ctypedef double_t (* skiplist_f)(Skiplist sl, int n)
+ctypedef double_t (* skiplist_f)(Skiplist sl, int n) nogil
 
 @cython.boundscheck(False)
-cdef _roll_skiplist_op(ndarray arg, int window, skiplist_f op):
-    '''Apply a rolling median/min/max function to an array'''
-    cdef ndarray[double_t, ndim=1] input = arg
-    cdef double val, prev, midpoint
-    cdef Skiplist sl
-    cdef int nobs = 0
-    cdef int i = 0
-    cdef int j = 0
-    cdef int N = len(input)
+@cython.wraparound(False)
+cdef void _roll_skiplist(const double[:, :] x, double[:, :] out, int window,
+                         Skiplist sl, skiplist_f op) nogil:
+    # The skiplist holds at most window values, it never allocates
+    cdef double val, prev
+    cdef int nobs
+    cdef Py_ssize_t i, k
+    cdef Py_ssize_t N = x.shape[0]
 
-    if window > N:
-        raise ValueError('Rolling operation not possible.')
+    for k in range(x.shape[1]):
+        sl._clear()
+        nobs = 0
+        for i in range(window):
+            val = x[i, k]
+            # Not NaN
+            if val == val:
+                nobs += 1
+                sl._insert(val)
 
-    sl = Skiplist()
-    cdef ndarray[double_t, ndim=1] output = np.empty(N-window+1, dtype=float)
+        out[0, k] = op(sl, nobs)
 
-    for i in range(window):
-        val = input[i]
-        # Not NaN
-        if val == val:
-            nobs += 1
-            sl.insert(val)
+        for i in range(window, N):
+            val = x[i, k]
+            prev = x[i - window, k]
 
-    output[j] = op(sl, nobs)
+            # Not NaN
+            if prev == prev:
+                sl._remove(prev)
+                nobs -= 1
+            # Not NaN
+            if val == val:
+                nobs += 1
+                sl._insert(val)
 
-    for i in range(window, N):
-        val = input[i]
-        prev = input[i - window]
+            out[i - window + 1, k] = op(sl, nobs)
 
-        # Not NaN
-        if prev == prev:
-            sl.remove(prev)
-            nobs -= 1
-        # Not NaN
-        if val == val:
-            nobs += 1
-            sl.insert(val)
-
-        j += 1
-        output[j] = op(sl, nobs)
 
+cdef _roll2d_skiplist_op(input, int window, skiplist_f op):
+    '''Apply a rolling median/min/max function to each column'''
+    input = np.asarray(input, dtype=float)
+    cdef const double[:, :] x = input
+    cdef ndarray output = _roll2d_output(input, window)
+    cdef double[:, :] out = output
+    cdef Skiplist sl = Skiplist(expected_size=window)
+    with nogil:
+        _roll_skiplist(x, out, window, sl, op)
     return output
 
-def roll_median(ndarray input, int window):
-    return _roll_skiplist_op(input, window, _get_median)
-
-def roll_max(ndarray input, int window):
-    return _roll_skiplist_op(input, window, _get_max)
+def roll2d_median(input, int window):
+    return _roll2d_skiplist_op(input, window, _get_median)
 
-def roll_min(ndarray input, int window):
-    return _roll_skiplist_op(input, window, _get_min)
+def roll_median(input, int window):
+    return _roll1d(roll2d_median, input, window)
 
 
-cdef double_t _get_median(Skiplist sl, int nobs):
+@cython.cdivision(True)
+cdef double_t _get_median(Skiplist sl, int nobs) nogil:
     cdef int midpoint
     if nobs:
         midpoint = nobs / 2
         if nobs % 2:
-            return sl.get(midpoint)
+            return sl._get(midpoint)
         else:
-            return (sl.get(midpoint) +
-                    sl.get(midpoint - 1)) / 2
+            return (sl._get(midpoint) +
+                    sl._get(midpoint - 1)) / 2
     else:
         return NaN
 
 
-cdef double_t _get_max(Skiplist sl, int nobs):
-    if nobs:
-        return sl.get(nobs - 1)
-    else:
-        return NaN
+#-------------------------------------------------------------------------------
+# Rolling min, max
+#
+# A monotonic deque of row positions, stored in a circular buffer of window
+# slots, keeps the candidates for the extreme of the window. Each row is
+# pushed and popped at most once, O(1) amortized per step. NaNs are skipped.
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _roll_extreme(const double[:, :] x, double[:, :] out, int window,
+                        int *deque, bint maximum) nogil:
+    cdef double val
+    cdef Py_ssize_t i, k, back
+    cdef Py_ssize_t N = x.shape[0]
+    cdef int head, size
 
-cdef double_t _get_min(Skiplist sl, int nobs):
-    if nobs:
-        return sl.get(0)
-    else:
-        return NaN
+    for k in range(x.shape[1]):
+        head = 0
+        size = 0
+        for i in range(N):
+            # drop the position leaving the window
+            if size and deque[head] <= i - window:
+                head = (head + 1) % window
+                size -= 1
+            val = x[i, k]
+            # Not NaN
+            if val == val:
+                while size:
+                    back = deque[(head + size - 1) % window]
+                    if (x[back, k] > val if maximum else x[back, k] < val):
+                        break
+                    size -= 1
+                deque[(head + size) % window] = i
+                size += 1
+            if i >= window - 1:
+                out[i - window + 1, k] = x[deque[head], k] if size else NaN
+
+
+cdef _roll2d_extreme(input, int window, bint maximum):
+    input = np.asarray(input, dtype=float)
+    cdef const double[:, :] x = input
+    cdef ndarray output = _roll2d_output(input, window)
+    cdef double[:, :] out = output
+    cdef int *deque = <int *>malloc(window * sizeof(int))
+    if deque == NULL:
+        raise MemoryError
+    try:
+        with nogil:
+            _roll_extreme(x, out, window, deque, maximum)
+    finally:
+        free(deque)
+    return output
+
+def roll2d_max(input, int window):
+    return _roll2d_extreme(input, window, True)
+
+def roll2d_min(input, int window):
+    return _roll2d_extreme(input, window, False)
+
+def roll_max(input, int window):
+    return _roll1d(roll2d_max, input, window)
+
+def roll_min(input, int window):
+    return _roll1d(roll2d_min, input, window)
 
 
 #-------------------------------------------------------------------------------
-# Rolling sum
+# Rolling mean, standard deviation and sharpe ratio
+#
+# These kernels release the GIL while rolling, so that blocks of columns
+# can be rolled concurrently from several threads. The standard deviation
+# is sqrt(scale * sum((x - mean)^2) / (nobs - ddof)) and the sharpe ratio
+# is mean * sqrt(scale / mean(x^2)).
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def roll_mean(ndarray[double_t, ndim=1] input, int window):
-    '''Apply a rolling sum function to an array'''
-    cdef double val, prev, sum_x = 0
-    cdef int nobs = 0
-    cdef int i = 0
-    cdef int j = 0
-    cdef int N = len(input)
+cdef void _roll_mean(const double[:, :] x, double[:, :] out,
+                     int window) nogil:
+    cdef double val, prev, sum_x
+    cdef int nobs
+    cdef Py_ssize_t i, k
+    cdef Py_ssize_t N = x.shape[0]
 
-    cdef ndarray[double_t, ndim=1] output = np.empty(N-window+1, dtype=float)
+    for k in range(x.shape[1]):
+        nobs = 0
+        sum_x = 0
+        for i in range(window):
+            val = x[i, k]
+            # Not NaN
+            if val == val:
+                nobs += 1
+                sum_x += val
 
-    for i in range(window):
-        val = input[i]
-        # Not NaN
-        if val == val:
-            nobs += 1
-            sum_x += val
+        out[0, k] = NaN if not nobs else sum_x / nobs
+
+        for i in range(window, N):
+            val = x[i, k]
+            prev = x[i - window, k]
+            if prev == prev:
+                sum_x -= prev
+                nobs -= 1
+
+            if val == val:
+                nobs += 1
+                sum_x += val
+
+            out[i - window + 1, k] = NaN if not nobs else sum_x / nobs
 
-    output[j] = NaN if not nobs else sum_x / nobs
 
-    for i in xrange(window,N):
-        val = input[i]
+cdef inline void _kahan_add(double *total, double *comp, double value) nogil:
+    # Add *value* to *total* with Kahan compensation *comp*
+    cdef double y = value - comp[0]
+    cdef double t = total[0] + y
+    comp[0] = (t - total[0]) - y
+    total[0] = t
 
-        prev = input[j]
-        if prev == prev:
-            sum_x -= prev
-            nobs -= 1
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef int _moments(const double[:, :] x, Py_ssize_t k, Py_ssize_t start,
+                  Py_ssize_t end, double *mean, double *m2) nogil:
+    # Mean and sum of squared deviations of the non missing values of
+    # column k from start to end, with the corrected two-pass algorithm.
+    # Return the number of observations.
+    cdef double val, delta, total = 0, comp = 0
+    cdef int nobs = 0
+    cdef Py_ssize_t i
+    mean[0] = m2[0] = 0
+    for i in range(start, end):
+        val = x[i, k]
         if val == val:
             nobs += 1
-            sum_x += val
+            total += val
+    if not nobs:
+        return 0
+    total = total / nobs
+    for i in range(start, end):
+        val = x[i, k]
+        if val == val:
+            delta = val - total
+            m2[0] += delta * delta
+            comp += delta
+    mean[0] = total + comp / nobs
+    m2[0] -= comp * comp / nobs
+    if m2[0] < 0:
+        m2[0] = 0
+    return nobs
+
 
-        j += 1
-        output[j] = NaN if not nobs else sum_x / nobs
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _roll_moments(const double[:, :] x, double[:, :] out, int window,
+                        double scale, int ddof, bint sharpe) nogil:
+    # Rolling mean and sum of squared deviations of each column with
+    # Welford updates, both accumulated with Kahan compensation. They are
+    # recomputed from scratch every window observations so that rounding
+    # errors do not accumulate.
+    cdef double val, prev, delta, mean, m2, cmean, cm2, var
+    cdef int nobs
+    cdef Py_ssize_t i, j, k
+    cdef Py_ssize_t N = x.shape[0]
 
+    for k in range(x.shape[1]):
+        nobs = 0
+        mean = m2 = cmean = cm2 = 0
+        for i in range(N):
+            if i >= window:
+                prev = x[i - window, k]
+                if prev == prev:
+                    nobs -= 1
+                    if nobs > 1:
+                        delta = prev - mean
+                        _kahan_add(&mean, &cmean, -delta / nobs)
+                        _kahan_add(&m2, &cm2, -delta * (prev - mean))
+                        if m2 < 0:
+                            m2 = cm2 = 0
+                    else:
+                        # restart from the remaining observation, if any
+                        mean = m2 = cmean = cm2 = 0
+                        for j in range(i - window + 1, i):
+                            if x[j, k] == x[j, k]:
+                                mean = x[j, k]
+            val = x[i, k]
+            if val == val:
+                nobs += 1
+                delta = val - mean
+                _kahan_add(&mean, &cmean, delta / nobs)
+                _kahan_add(&m2, &cm2, delta * (val - mean))
+            j = i - window + 1
+            if j < 0:
+                continue
+            if not j % window:
+                nobs = _moments(x, k, j, i + 1, &mean, &m2)
+                cmean = cm2 = 0
+            var = m2 if m2 > 0 else 0
+            if sharpe:
+                var = var / nobs + mean*mean if nobs else 0
+                out[j, k] = (NaN if not nobs or var == 0 else
+                             mean * sqrt(scale / var))
+            else:
+                out[j, k] = (NaN if nobs - ddof <= 0 else
+                             sqrt(scale * var / (nobs - ddof)))
+
+
+def roll2d_mean(input, int window):
+    '''Apply a rolling mean function to each column'''
+    input = np.asarray(input, dtype=float)
+    cdef const double[:, :] x = input
+    cdef ndarray output = _roll2d_output(input, window)
+    cdef double[:, :] out = output
+    with nogil:
+        _roll_mean(x, out, window)
     return output
+
+def roll2d_sd(input, int window, double scale=1.0, int ddof=0):
+    '''Apply a rolling standard deviation function to each column'''
+    input = np.asarray(input, dtype=float)
+    cdef const double[:, :] x = input
+    cdef ndarray output = _roll2d_output(input, window)
+    cdef double[:, :] out = output
+    with nogil:
+        _roll_moments(x, out, window, scale, ddof, False)
+    return output
+
+def roll2d_sharpe(input, int window, double scale=1.0):
+    '''Apply a rolling sharpe ratio function to each column'''
+    input = np.asarray(input, dtype=float)
+    cdef const double[:, :] x = input
+    cdef ndarray output = _roll2d_output(input, window)
+    cdef double[:, :] out = output
+    with nogil:
+        _roll_moments(x, out, window, scale, 0, True)
+    return output
+
+def roll_mean(input, int window):
+    return _roll1d(roll2d_mean, input, window)
+
+def roll_sd(input, int window, double scale=1.0, int ddof=0):
+    return _roll1d(roll2d_sd, input, window, scale, ddof)
+
+def roll_sharpe(input, int window, double scale=1.0):
+    return _roll1d(roll2d_sharpe, input, window, scale)
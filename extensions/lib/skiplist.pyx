@@ -3,69 +3,54 @@
 # Original cython version: Wes McKinney
 # Original license: MIT
 # Link: http://code.activestate.com/recipes/576930/
+#
+# Nodes live in flat C arrays. Node 0 is the head, node 1 the terminator
+# and the remaining nodes form a pool recycled via a free-list, so that
+# once the capacity is reached insert and remove do not allocate.
 
-from random import random
+from libc.math cimport INFINITY
+from libc.stdlib cimport malloc, realloc, free
+from libc.stdint cimport uint64_t
 
-
-cdef class Node:
-
-    cdef public:
-        double value
-        list next
-        ndarray width_arr
-
-    cdef:
-        int *width
-
-    def __init__(self, double value, list next, ndarray width):
-        self.value = value
-        self.next = next
-        self.width_arr = width
-        self.width = <int *> width.data
-
-NIL = Node(np.inf, [], np.array([])) # Singleton terminator node
-
-
-cdef class skiplistiterator:
-
-    cdef:
-        Node node
-
-    def __init__(self, node):
-        self.node = node
-
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        cdef Node node
-        node = self.node.next[0]
-        if node is not NIL:
-            self.node = node
-            return node.value
-        else:
-            raise StopIteration
+cdef int HEAD = 0
+cdef int NIL = 1
 
 
 cdef class Skiplist:
     '''
     Sorted collection supporting O(lg n) insertion, removal, and lookup by rank.
+
+    :parameter expected_size: number of values the skiplist is sized for.
+        The skiplist grows beyond it, doubling its capacity, if needed.
     '''
     cdef:
-        int size, maxlevels
-        Node head
-
-    def __repr__(self):
-        return list(self).__repr__()
-
-    def __str__(self):
-        return self.__repr__()
+        int size, capacity, maxlevels, nfree
+        uint64_t seed
+        double *value
+        int *height
+        int *next
+        int *width
+        int *free
+        int *chain
+        int *steps
+
+    def __cinit__(self):
+        self.value = NULL
+        self.height = NULL
+        self.next = NULL
+        self.width = NULL
+        self.free = NULL
+        self.chain = NULL
+        self.steps = NULL
 
     def __init__(self, *args, expected_size=100):
         self.size = 0
-        self.maxlevels = 1 + int(Log2(expected_size))
-        self.head = Node(np.NaN, [NIL] * self.maxlevels,
-                         np.ones(self.maxlevels, dtype=int))
+        self.capacity = 0
+        self.maxlevels = 0
+        self.nfree = 0
+        self.seed = 88172645463325252ULL
+        if self._grow(max(int(expected_size), 1)):
+            raise MemoryError
         if args:
             if len(args) > 1:
                 raise TypeError(
@@ -74,108 +59,232 @@ cdef class Skiplist:
                 )
             self.extend(args[0])
 
-    def __len__(self):
-        return self.size
+    def __dealloc__(self):
+        free(self.value)
+        free(self.height)
+        free(self.next)
+        free(self.width)
+        free(self.free)
+        free(self.chain)
+        free(self.steps)
 
-    def get(self, int i):
-        cdef int level
-        cdef Node node
+    def __repr__(self):
+        return list(self).__repr__()
 
-        node = self.head
-        i += 1
+    def __str__(self):
+        return self.__repr__()
 
-        for level in range(self.maxlevels - 1, -1, -1):
-            while node.width[level] <= i:
-                i -= node.width[level]
-                node = node.next[level]
+    def __len__(self):
+        return self.size
 
-        return node.value
+    def get(self, int i):
+        if i < 0 or i >= self.size:
+            raise IndexError('skiplist index out of range')
+        return self._get(i)
 
     def __getitem__(self, i):
         return self.get(i)
 
-    def insert(self, double value):
-        cdef int level, steps, d
-        cdef Node node, prevnode, newnode, next_at_level
-        cdef list chain, steps_at_level
+    def rank(self, double value):
+        '''Return the 0-based index (rank) of *value*. If the value is not
+available it returns a negative integer which absolute value is the
+left most closest index with value less than *value*.'''
+        cdef int level, node = HEAD, nxt, rank = 0
+        cdef int L = self.maxlevels
+        for level in range(L - 1, -1, -1):
+            nxt = self.next[node*L + level]
+            while nxt != NIL and self.value[nxt] <= value:
+                rank += self.width[node*L + level]
+                node = nxt
+                nxt = self.next[node*L + level]
+        if node != HEAD and self.value[node] == value:
+            return rank - 1
+        else:
+            return -1 - rank
 
-        # find first node on each level where node.next[levels].value > value
-        chain = [None] * self.maxlevels
-        steps_at_level = [0] * self.maxlevels
+    def insert(self, double value):
+        if self._insert(value):
+            raise MemoryError
 
-        node = self.head
-        for level in range(self.maxlevels - 1, -1, -1):
-            next_at_level = node.next[level]
+    def extend(self, iterable):
+        i = self.insert
+        for v in iterable:
+            i(v)
 
-            while next_at_level.value <= value:
-                steps_at_level[level] = (steps_at_level[level] +
-                                         node.width[level])
-                node = next_at_level
-                next_at_level = node.next[level]
+    def remove(self, double value):
+        if self._remove(value):
+            raise KeyError('Not Found')
 
-            chain[level] = node
+    def clear(self):
+        self._clear()
 
-        # insert a link to the newnode at each level
-        d = min(self.maxlevels, 1 - int(Log2(random())))
-        newnode = Node(value, [None] * d, np.empty(d, dtype=int))
-        steps = 0
+    def __iter__(self):
+        'Iterate over values in sorted order'
+        cdef int node = self.next[HEAD*self.maxlevels]
+        while node != NIL:
+            yield self.value[node]
+            node = self.next[node*self.maxlevels]
+
+    cdef int _grow(self, int capacity) nogil:
+        # Resize the node arrays to hold *capacity* values. Return -1 if
+        # memory could not be allocated. Links, capacity and levels are
+        # only replaced once all allocations succeeded.
+        cdef int node, level, n
+        cdef int old = self.maxlevels
+        cdef int L = 1 + <int>Log2(capacity)
+        cdef int *next
+        cdef int *width
+        if L < old:
+            L = old
+        n = capacity + 2
+        if (_realloc(&self.value, n * sizeof(double)) or
+                _realloc(&self.height, n * sizeof(int)) or
+                _realloc(&self.free, n * sizeof(int)) or
+                _realloc(&self.chain, L * sizeof(int)) or
+                _realloc(&self.steps, L * sizeof(int))):
+            return -1
+        next = <int *>malloc(n * L * sizeof(int))
+        width = <int *>malloc(n * L * sizeof(int))
+        if next == NULL or width == NULL:
+            free(next)
+            free(width)
+            return -1
+        for node in range(self.capacity + 2 if old else 2):
+            for level in range(L):
+                if level < old:
+                    next[node*L + level] = self.next[node*old + level]
+                    width[node*L + level] = self.width[node*old + level]
+                else:
+                    next[node*L + level] = NIL
+                    width[node*L + level] = self.size + 1
+        free(self.next)
+        free(self.width)
+        self.next = next
+        self.width = width
+        self.value[NIL] = INFINITY
+        for node in range(n - 1, self.capacity + 1, -1):
+            self.free[self.nfree] = node
+            self.nfree += 1
+        self.capacity = capacity
+        self.maxlevels = L
+        return 0
+
+    cdef inline int _level(self) nogil:
+        # Random level with probability 1/2 of increasing, from a
+        # xorshift generator
+        cdef int level = 1
+        cdef uint64_t r
+        self.seed ^= self.seed << 13
+        self.seed ^= self.seed >> 7
+        self.seed ^= self.seed << 17
+        r = self.seed
+        while r & 1 and level < self.maxlevels:
+            level += 1
+            r >>= 1
+        return level
+
+    cdef double _get(self, int i) nogil:
+        cdef int level, node = HEAD
+        cdef int L = self.maxlevels
+        i += 1
+        for level in range(L - 1, -1, -1):
+            while self.width[node*L + level] <= i:
+                i -= self.width[node*L + level]
+                node = self.next[node*L + level]
+        return self.value[node]
 
-        for level in range(d):
-            prevnode = chain[level]
+    cdef int _insert(self, double value) nogil:
+        cdef int level, d, node, nxt, prev, new, steps
+        cdef int L
 
-            newnode.next[level] = prevnode.next[level]
-            prevnode.next[level] = newnode
+        if not self.nfree and self._grow(2*self.capacity):
+            return -1
+        L = self.maxlevels
 
-            newnode.width[level] = prevnode.width[level] - steps
-            prevnode.width[level] = steps + 1
+        # find first node on each level where node.next[levels].value > value
+        node = HEAD
+        for level in range(L - 1, -1, -1):
+            self.steps[level] = 0
+            nxt = self.next[node*L + level]
+            while nxt != NIL and self.value[nxt] <= value:
+                self.steps[level] += self.width[node*L + level]
+                node = nxt
+                nxt = self.next[node*L + level]
+            self.chain[level] = node
+
+        # insert a link to the new node at each level
+        d = self._level()
+        self.nfree -= 1
+        new = self.free[self.nfree]
+        self.value[new] = value
+        self.height[new] = d
+        steps = 0
 
-            steps = steps + steps_at_level[level]
+        for level in range(d):
+            prev = self.chain[level]
+            self.next[new*L + level] = self.next[prev*L + level]
+            self.next[prev*L + level] = new
+            self.width[new*L + level] = self.width[prev*L + level] - steps
+            self.width[prev*L + level] = steps + 1
+            steps += self.steps[level]
 
-        for level in range(d, self.maxlevels):
-            (<Node> chain[level]).width[level] += 1
+        for level in range(d, L):
+            self.width[self.chain[level]*L + level] += 1
 
         self.size += 1
+        return 0
 
-    def extend(self, iterable):
-        i = self.insert
-        for v in iterable:
-            i(v)
-
-    def remove(self, double value):
-        cdef int level, d
-        cdef Node node, prevnode, tmpnode, next_at_level
-        cdef list chain
+    cdef int _remove(self, double value) nogil:
+        cdef int level, d, node, nxt, prev
+        cdef int L = self.maxlevels
 
         # find first node on each level where node.next[levels].value >= value
-        chain = [None] * self.maxlevels
-        node = self.head
-
-        for level in range(self.maxlevels - 1, -1, -1):
-            next_at_level = node.next[level]
-            while next_at_level.value < value:
-                node = next_at_level
-                next_at_level = node.next[level]
-
-            chain[level] = node
-
-        if value != chain[0].next[0].value:
-            raise KeyError('Not Found')
+        node = HEAD
+        for level in range(L - 1, -1, -1):
+            nxt = self.next[node*L + level]
+            while nxt != NIL and self.value[nxt] < value:
+                node = nxt
+                nxt = self.next[node*L + level]
+            self.chain[level] = node
+
+        node = self.next[self.chain[0]*L]
+        if node == NIL or self.value[node] != value:
+            return -1
 
         # remove one link at each level
-        d = len(chain[0].next[0].next)
-
+        d = self.height[node]
         for level in range(d):
-            prevnode = chain[level]
-            tmpnode = prevnode.next[level]
-            prevnode.width[level] += tmpnode.width[level] - 1
-            prevnode.next[level] = tmpnode.next[level]
+            prev = self.chain[level]
+            self.width[prev*L + level] += self.width[node*L + level] - 1
+            self.next[prev*L + level] = self.next[node*L + level]
 
-        for level in range(d, self.maxlevels):
-            tmpnode = chain[level]
-            tmpnode.width[level] -= 1
+        for level in range(d, L):
+            self.width[self.chain[level]*L + level] -= 1
 
+        self.free[self.nfree] = node
+        self.nfree += 1
         self.size -= 1
+        return 0
+
+    cdef void _clear(self) nogil:
+        # Remove all values, keeping the allocated nodes
+        cdef int node, level
+        cdef int L = self.maxlevels
+        for level in range(L):
+            self.next[HEAD*L + level] = NIL
+            self.width[HEAD*L + level] = 1
+        self.nfree = 0
+        for node in range(self.capacity + 1, 1, -1):
+            self.free[self.nfree] = node
+            self.nfree += 1
+        self.size = 0
 
-    def __iter__(self):
-        'Iterate over values in sorted order'
-        return skiplistiterator(self.head)
+
+cdef int _realloc(void *ptr, size_t size) nogil:
+    # Reallocate the array pointed by *ptr*, return -1 on failure
+    cdef void **p = <void **>ptr
+    cdef void *data = realloc(p[0], size)
+    if data == NULL:
+        return -1
+    p[0] = data
+    return 0
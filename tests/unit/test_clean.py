@@ -1,6 +1,8 @@
+import numpy as np
 from numpy import nan
 
 from dynts.utils import test
+from dynts.exc import NotAvailable
 
 
 class TestClean(test.TestCase):
@@ -27,6 +29,53 @@ class TestClean(test.TestCase):
         self.assertEqual(len(cts), 2)
         return ts
 
+    def testDropAnyAll(self):
+        ts = self.testClean()
+        cts = ts.clean('dropany')
+        self.assertEqual(cts.dates().tolist(), [3, 4])
+        cts = ts.clean('dropall')
+        self.assertEqual(cts.dates().tolist(), [2, 3, 4, 5, 6, 7])
+
+    def testFill(self):
+        ts = self.timeseries(date=[1, 2, 3, 4, 5, 6, 7],
+                             data=[[nan, 1], [1, nan], [nan, nan],
+                                   [nan, nan], [4, 4], [nan, 5], [6, nan]])
+        values = ts.clean('ffill').values()
+        self.assertTrue(np.isnan(values[0, 0]))
+        self.assertAlmostEqual(values[1:, 0],
+                               np.array([1., 1., 1., 4., 4., 6.]))
+        self.assertAlmostEqual(values[:, 1],
+                               np.array([1., 1., 1., 1., 4., 5., 5.]))
+        values = ts.clean('bfill', limit=1).values()
+        self.assertAlmostEqual(values[:, 0][[0, 1, 3, 4, 5, 6]],
+                               np.array([1., 1., 4., 4., 6., 6.]))
+        self.assertTrue(np.isnan(values[2, 0]))
+        self.assertTrue(np.isnan(values[6, 1]))
+        values = ts.clean('linear').values()
+        self.assertAlmostEqual(values[1:, 0],
+                               np.array([1., 2., 3., 4., 5., 6.]))
+        self.assertTrue(np.isnan(values[0, 0]))
+        self.assertTrue(np.isnan(values[6, 1]))
+
+    def testTimeInterpolation(self):
+        ts = self.timeseries(date=[1, 2, 5], data=[0, nan, 4])
+        self.assertAlmostEqual(ts.clean('linear').values()[:, 0],
+                               np.array([0., 2., 4.]))
+        self.assertAlmostEqual(ts.clean('time').values()[:, 0],
+                               np.array([0., 1., 4.]))
+        self.assertRaises(NotAvailable, ts.clean, 'foo')
+
+    def testCallable(self):
+        ts = self.testClean()
+
+        def zero(ts, value=0):
+            return ts.clone(data=np.where(np.isnan(ts.values()), value,
+                                          ts.values()))
+
+        self.assertEqual(ts.clean(zero).values()[0].tolist(), [0., 0.])
+        self.assertEqual(ts.clean(zero, value=1).values()[5].tolist(),
+                         [-1., 1.])
+
     def testItems(self):
         ts = self.testClean()
         v = list(ts.items(start_value=0))
@@ -1,6 +1,39 @@
+import numpy as np
+
 from dynts.utils import test
 from dynts import api
 from dynts.dsl import ast
+from dynts.data import TimeSerieLoader
+
+
+class StaticLoader(TimeSerieLoader):
+    '''Loader serving timeseries from a dictionary. If *dates* is given,
+    dates are integers in the (first, last) range.'''
+    def __init__(self, data, dates=None):
+        self.data = data
+        self.loaded = []
+        self.intervals = []
+        self.range = dates
+
+    def dates(self, start, end):
+        if self.range is None:
+            return super().dates(start, end)
+        first, last = self.range
+        return (first if start is None else start,
+                last if end is None else end)
+
+    def extend_start(self, start, lookback):
+        if self.range is None:
+            return super().extend_start(start, lookback)
+        return start - lookback
+
+    def preprocess(self, symbol, start, end, logger, backend, **kwargs):
+        self.loaded.append(symbol.ticker)
+        self.intervals.append((start, end))
+        ts = self.data[symbol.ticker]
+        if self.range is not None:
+            ts = ts.window(start, end)
+        return self.preprocessdata(result=ts)
 
 
 class TestDsl(test.TestCase):
@@ -140,3 +173,321 @@ class TestDsl(test.TestCase):
         self.assertEqual(len(result), 2)
         self.assertEqual(str(result[0]), 'EUR')
         self.assertEqual(str(result[1]), '-3')
+
+    def testParserCache(self):
+        from dynts.dsl import rules
+        from dynts.dsl.functions import function_registry
+        p1 = rules.parsers.get_parser(function_registry)
+        p2 = rules.parsers.get_parser(function_registry)
+        self.assertEqual(p1, p2)
+        self.assertEqual(str(api.parse('ma(GOOG)')), 'ma(GOOG)')
+        self.assertEqual(rules.parsers.get_parser(function_registry), p1)
+
+    def testParserCacheInvalidation(self):
+        from dynts.dsl import rules
+        from dynts.dsl.functions import function_registry, composeFunction
+        p1 = rules.parsers.get_parser(function_registry)
+        res = api.parse('tmpfunc(GOOG)')
+        self.assertTrue(res.malformed())
+        composeFunction('tmpfunc', 'sd(x1)')
+        try:
+            p2 = rules.parsers.get_parser(function_registry)
+            self.assertNotEqual(p1, p2)
+            self.assertFalse(p1 in rules.parsers.values())
+            res = api.parse('tmpfunc(GOOG)')
+            self.assertFalse(res.malformed())
+        finally:
+            function_registry.unregister('tmpfunc')
+        res = api.parse('tmpfunc(GOOG)')
+        self.assertTrue(res.malformed())
+
+    def testParserCacheFunctions(self):
+        from dynts.dsl import rules
+        p1 = rules.parsers.get_parser({})
+        p2 = rules.parsers.get_parser({})
+        self.assertEqual(p1, p2)
+        res = api.parse('ma(GOOG)', functions={})
+        self.assertTrue(res.malformed())
+
+    def testExpressionCache(self):
+        from dynts.dsl import rules
+        rules.expressions.clear()
+        res1 = api.parse('avol(GOOG)')
+        self.assertEqual(rules.expressions.misses, 1)
+        self.assertEqual(rules.expressions.hits, 0)
+        res2 = api.parse('AVOL(goog) ')
+        self.assertEqual(rules.expressions.misses, 1)
+        self.assertEqual(rules.expressions.hits, 1)
+        self.assertEqual(res1, res2)
+        self.assertNotEqual(id(res1), id(res2))
+        self.assertNotEqual(id(res1.value), id(res2.value))
+        self.assertEqual(res1.func, res2.func)
+
+    def testExpressionCacheClean(self):
+        from dynts.dsl import rules
+        rules.expressions.clear()
+        res1 = api.parse('2*GOOG')
+        res1.right._unwind_value = None
+        res2 = api.parse('2*GOOG')
+        self.assertEqual(rules.expressions.hits, 1)
+        self.assertFalse(hasattr(res2.right, '_unwind_value'))
+        self.assertFalse(hasattr(res2, '_unwind_value'))
+
+    def testExpressionCacheSize(self):
+        from dynts.dsl import rules
+        cache = rules.ExpressionCache(maxsize=2)
+        for expr in ('a', 'b', 'a', 'c'):
+            cache.get_expression(expr, lambda: ast.Symbol(expr))
+        self.assertEqual(list(cache), ['a', 'c'])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 3)
+
+    def testCompositeTemplate(self):
+        from dynts.dsl import DSLResult
+        from dynts.dsl.functions import function_registry
+        avol = function_registry['avol']
+        self.assertTrue(isinstance(avol.template, ast.MultiplyOp))
+        ts1 = self.timeseries('X', date=range(100), data=range(1, 101))
+        ts2 = self.timeseries('X', date=range(100), data=range(100, 200))
+        r1 = DSLResult(api.parse('avol(X)'), {'X': ts1}).ts()
+        r2 = DSLResult(api.parse('avol(X)'), {'X': ts2}).ts()
+        r3 = DSLResult(api.parse('15.874*sd(ldelta(X),window=20)'),
+                       {'X': ts2}).ts()
+        self.assertAlmostEqual(avol([ts1]).values(), r1.values())
+        self.assertAlmostEqual(avol([ts2]).values(), r2.values())
+        self.assertEqual(len(r1), 80)
+        self.assertNotAlmostEqual(r1.values()[-1, 0], r2.values()[-1, 0])
+        self.assertAlmostEqual(r2.values(), r3.values())
+        r4 = DSLResult(api.parse('avol(X,window=30)'), {'X': ts1}).ts()
+        self.assertEqual(len(r4), 70)
+
+    def testEvaluateMany(self):
+        from dynts.dsl import DSLResult
+        goog = self.timeseries('GOOG', date=range(100), data=range(1, 101))
+        amzn = self.timeseries('AMZN', date=range(100), data=range(2, 102))
+        loader = StaticLoader({'GOOG': goog, 'AMZN': amzn}, (0, 99))
+        expressions = ['avol(GOOG)', 'sd(ldelta(GOOG),window=60)',
+                       'sharpe(ldelta(GOOG))', 'AMZN-GOOG']
+        results = api.evaluate_many(expressions, loader=loader)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(loader.loaded), ['AMZN', 'GOOG'])
+        plan = results[0].plan
+        self.assertEqual(plan.eliminated, 5)
+        self.assertEqual(plan.symbols(), ['GOOG', 'AMZN'])
+        self.assertEqual(len(plan.roots), 4)
+        for expression, result in zip(expressions, results):
+            self.assertEqual(result.expression, api.parse(expression))
+            expected = DSLResult(api.parse(expression), result.data).ts()
+            self.assertEqual(result.ts().shape, expected.shape)
+            self.assertAlmostEqual(result.ts().values(), expected.values())
+
+    def testEvaluateExecutor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from dynts.dsl import DSLResult
+        goog = self.timeseries('GOOG', date=range(100), data=range(1, 101))
+        amzn = self.timeseries('AMZN', date=range(100), data=range(2, 102))
+        loader = StaticLoader({'GOOG': goog, 'AMZN': amzn}, (0, 99))
+        expression = 'ldelta(GOOG)*ldelta(AMZN)+2*ldelta(GOOG)'
+        expected = api.evaluate(expression, loader=loader).ts()
+        with ThreadPoolExecutor(4) as executor:
+            result = api.evaluate(expression, loader=loader,
+                                  executor=executor).ts()
+        self.assertEqual(result.name, expected.name)
+        self.assertAlmostEqual(result.values(), expected.values())
+        result = DSLResult(api.parse(expression), {'GOOG': goog,
+                                                   'AMZN': amzn})
+        result.unwind(executor=2)
+        self.assertAlmostEqual(result.ts().values(), expected.values())
+        results = api.evaluate_many(['avol(GOOG)', 'AMZN-GOOG'],
+                                    loader=loader, executor=3)
+        self.assertAlmostEqual(results[1].ts().values(),
+                               (amzn - goog).values())
+
+    def testEvaluationContext(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from dynts.dsl import ExpressionPlan
+        from dynts.dsl.plan import EvaluationContext
+        expression = api.parse('ldelta(X)*ldelta(X)+2*ldelta(X)')
+        plan = ExpressionPlan([expression])
+        data = [{'X': self.timeseries('X', date=range(100),
+                                      data=range(n, 100 + n))}
+                for n in range(1, 9)]
+        expected = [plan.unwind(values, 'numpy')[0] for values in data]
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda v: plan.unwind(v, 'numpy'),
+                                        data))
+        for result, values, ts in zip(results, data, expected):
+            self.assertEqual(list(values), ['X'])
+            self.assertAlmostEqual(result[0].values(), ts.values())
+        with EvaluationContext(plan, data[0], 'numpy') as context:
+            context.run()
+            self.assertEqual(list(context.results), [plan.roots[0].key])
+            self.assertTrue(context.peak < len(plan))
+        self.assertFalse(context.results)
+
+    def testLookback(self):
+        from dynts.dsl import ExpressionPlan
+        plan = ExpressionPlan([
+            api.parse('sd(ldelta(GOOG),window=60)'),
+            api.parse('avol(delta2(AMZN,lag=2),window=10)+GOOG'),
+            api.parse('MSFT')])
+        self.assertEqual(plan.lookback(), {'GOOG': 60, 'AMZN': 14,
+                                           'MSFT': 0})
+        goog = self.timeseries('GOOG', date=range(100), data=range(1, 101))
+        loader = StaticLoader({'GOOG': goog}, (0, 99))
+        result, = api.evaluate_many([('sd(ldelta(GOOG),window=10)', 50,
+                                      None)], loader=loader)
+        self.assertEqual(loader.intervals, [(40, 99)])
+        self.assertEqual(result.start, 50)
+        ts = result.ts()
+        self.assertEqual(len(ts), 50)
+        self.assertEqual(ts.start(), 50)
+        full = api.evaluate('sd(ldelta(GOOG),window=10)',
+                            loader=StaticLoader({'GOOG': goog}, (0, 99)))
+        self.assertAlmostEqual(ts.values(), full.ts().window(50, 99).values())
+
+    def testTail(self):
+        goog = self.timeseries('GOOG', date=range(100), data=range(1, 101))
+        self.assertEqual(goog.tail(5).dates().tolist(), [95, 96, 97, 98, 99])
+        self.assertTrue(goog.tail(200) is goog)
+        expression = 'sd(ldelta(GOOG),window=10)'
+        loader = StaticLoader({'GOOG': goog}, (0, 99))
+        result = api.evaluate(expression, loader=loader, tail=5)
+        self.assertEqual(loader.intervals, [(84, 99)])
+        self.assertEqual(result.tail, 5)
+        ts = result.ts()
+        self.assertEqual(ts.dates().tolist(), [95, 96, 97, 98, 99])
+        full = api.evaluate(expression,
+                            loader=StaticLoader({'GOOG': goog}, (0, 99)))
+        self.assertAlmostEqual(ts.values(), full.ts().tail(5).values())
+        result = api.evaluate('avol(GOOG)+GOOG', loader=loader, tail=3)
+        self.assertEqual(len(result.ts()), 3)
+
+    def testTailCalendars(self):
+        from dynts.dsl import DSLResult
+        a = self.timeseries('A', date=range(100), data=range(1, 101))
+        b = self.timeseries('B', date=range(0, 100, 3),
+                            data=range(1, 35))
+        data = {'A': a, 'B': b}
+        for expression in ('A,B', 'ma(A+B,window=3)',
+                           'ldelta(A)*ldelta(B),B'):
+            full = DSLResult(api.parse(expression), data).ts().tail(5)
+            result = DSLResult(api.parse(expression), data)
+            result.tail = 5
+            ts = result.ts()
+            self.assertEqual(ts.dates().tolist(), [95, 96, 97, 98, 99])
+            self.assertEqual(ts.dates().tolist(), full.dates().tolist())
+            self.assertTrue(np.allclose(ts.values(), full.values(),
+                                        equal_nan=True))
+
+    def testExplain(self):
+        import json
+        from dynts import lib
+        goog = self.timeseries('GOOG', date=range(100), data=range(1, 101))
+        loader = StaticLoader({'GOOG': goog}, (0, 99))
+        result = api.evaluate('sd(ldelta(GOOG),window=10)+max(GOOG)',
+                              loader=loader, profile=True)
+        profile = result.explain()
+        self.assertTrue(profile is result.profile)
+        self.assertTrue(profile.load_time >= 0)
+        self.assertEqual(len(profile.nodes), len(result.plan))
+        lines = profile.tree().split('\n')
+        self.assertTrue(lines[0].startswith('load: '))
+        self.assertTrue(lines[1].startswith(str(result.expression)))
+        data = json.loads(profile.json())
+        root = data['expressions'][0]
+        self.assertEqual(root['type'], 'plusop')
+        self.assertEqual(root['output'], [90, 1])
+        self.assertEqual(root['bytes'], 90*16)
+        # keys of max(GOOG) are a view of the GOOG keys
+        child = root['children'][1]
+        self.assertEqual(child['expression'], 'max(GOOG)')
+        self.assertEqual(child['bytes'], child['output'][0]*8)
+        # symbols data is attributed to loading
+        symbol = child['children'][0]
+        self.assertEqual(symbol['type'], 'symbol')
+        self.assertEqual((symbol['bytes'], symbol['loaded']), (0, 100*16))
+        self.assertEqual(data['load_bytes'], 100*16)
+        kernels = json.dumps(data)
+        impl = 'cts' if hasattr(lib, 'roll2d_max') else 'fallback'
+        self.assertTrue('roll2d_max (%s)' % impl in kernels)
+        self.assertTrue('roll2d_sd (' in kernels)
+        # explain without profiling
+        result = api.evaluate('ldelta(GOOG)', loader=loader)
+        profile = result.explain()
+        self.assertEqual(profile.load_time, None)
+        self.assertEqual(len(profile.nodes), len(result.plan))
+
+    def testInplace(self):
+        from dynts.dsl import ExpressionPlan
+        x = self.timeseries('X', date=range(100), data=range(1, 101))
+        values = x.values().copy()
+        plan = ExpressionPlan([api.parse('2*ldelta(X)+1'),
+                               api.parse('ldelta(X)*3'),
+                               api.parse('X*2')])
+        r1, r2, r3 = plan.unwind({'X': x}, 'numpy')
+        self.assertAlmostEqual(x.values(), values)
+        delta = x.logdelta().values()
+        self.assertAlmostEqual(r1.values(), 2*delta + 1)
+        self.assertAlmostEqual(r2.values(), 3*delta)
+        self.assertAlmostEqual(r3.values(), 2*values)
+
+    def testInplaceInteger(self):
+        from dynts.dsl import ExpressionPlan
+        x = self.timeseries('X', date=range(10),
+                            data=np.arange(1, 11, dtype=np.int64))
+        self.assertEqual(x.values().dtype, np.int64)
+        plan = ExpressionPlan([api.parse('X*2/2'), api.parse('2*X/2'),
+                               api.parse('2/X')])
+        r1, r2, r3 = plan.unwind({'X': x}, 'numpy')
+        values = np.arange(1., 11.)
+        self.assertAlmostEqual(r1.values()[:, 0], values)
+        self.assertAlmostEqual(r2.values()[:, 0], values)
+        self.assertAlmostEqual(r3.values()[:, 0], 2/values)
+        self.assertAlmostEqual(x.values()[:, 0], values)
+
+    def testPlanComposite(self):
+        from dynts.dsl import ExpressionPlan
+        plan = ExpressionPlan([api.parse('avol(GOOG), vol(GOOG)'),
+                               api.parse('avol(GOOG)'),
+                               api.parse('avol(GOOG,window=60)')])
+        keys = [str(node) for node in plan.nodes]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertTrue('sd(ldelta(GOOG), window=60)' in keys)
+        self.assertEqual(keys.count('GOOG'), 1)
+        self.assertEqual(plan.roots[1], plan.roots[0].children[0])
+        self.assertEqual(len(plan), len(plan.nodes))
+
+    def testEvaluateManyDates(self):
+        from datetime import date
+        loader = StaticLoader({'GOOG': self.timeseries('GOOG'),
+                               'AMZN': self.timeseries('AMZN')})
+        expressions = [('GOOG', date(2014, 1, 1), date(2014, 6, 1)),
+                       ('AMZN', date(2013, 1, 1), date(2014, 2, 1)),
+                       ('GOOG:YAHOO', date(2014, 2, 1), date(2015, 2, 1))]
+        results = api.evaluate_many(expressions, loader=loader)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(loader.loaded, ['GOOG', 'AMZN'])
+        self.assertEqual(loader.intervals,
+                         [(date(2013, 1, 1), date(2015, 2, 1))] * 2)
+        self.assertEqual(results[0].start, date(2014, 1, 1))
+        self.assertEqual(results[1].end, date(2014, 2, 1))
+        self.assertEqual(results[2].data['GOOG:YAHOO'],
+                         results[2].data['GOOG'])
+
+    def testTrim(self):
+        from dynts.dsl import DSLResult
+        goog = self.timeseries('GOOG', date=range(100), data=range(1, 101))
+        result = DSLResult(api.parse('ma(GOOG,window=10)'), {'GOOG': goog})
+        result.start = 30
+        result.end = 60
+        ts = result.ts()
+        self.assertEqual(len(ts), 31)
+        self.assertEqual(ts.start(), 30)
+        self.assertEqual(ts.end(), 60)
+        result = DSLResult(api.parse('GOOG'), {'GOOG': goog})
+        result.start = 200
+        self.assertEqual(len(result.ts()), 0)
+        result = DSLResult(api.parse('GOOG'), {'GOOG': goog})
+        result.end = 200
+        self.assertEqual(result.ts(), goog)
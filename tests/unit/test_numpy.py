@@ -0,0 +1,226 @@
+import numpy as np
+
+from dynts.utils import test
+from dynts.api.timeseries import ts_merge
+
+
+class TestNumpy(test.TestCase):
+
+    def testMerge(self):
+        ts1 = self.timeseries('A', date=[1, 3, 5], data=[1, 3, 5])
+        ts2 = self.timeseries('B__C', date=[2, 3, 6],
+                              data=[[1, 2], [3, 4], [5, 6]])
+        ts3 = self.timeseries('D', date=[3, 5, 6], data=[3, 5, 6])
+        ts = ts_merge([ts1, ts2, ts3])
+        self.assertEqual(ts.names(), ['A', 'B', 'C', 'D'])
+        self.assertEqual(ts.dates().tolist(), [1, 2, 3, 5, 6])
+        values = ts.values()
+        self.assertEqual(np.isnan(values).sum(axis=0).tolist(), [2, 2, 2, 2])
+        self.assertAlmostEqual(values[2], np.array([3., 3., 4., 3.]))
+        self.assertAlmostEqual(values[4, 1:], np.array([5., 6., 6.]))
+
+    def testMergeModes(self):
+        ts1 = self.timeseries('A', date=[1, 3, 5], data=[1, 3, 5])
+        ts2 = self.timeseries('B', date=[2, 3, 5, 6], data=[2, 3, 5, 6])
+        ts = ts1.merge(ts2, all=False)
+        self.assertEqual(ts.dates().tolist(), [3, 5])
+        self.assertAlmostEqual(ts.values(), np.array([[3., 3.], [5., 5.]]))
+        ts = ts1.merge([ts2], how='left', fill=0)
+        self.assertEqual(ts.dates().tolist(), [1, 3, 5])
+        self.assertAlmostEqual(ts.values()[:, 1], np.array([0., 3., 5.]))
+        ts = ts1.merge(self.timeseries('B'), how='inner')
+        self.assertFalse(ts)
+        self.assertRaises(ValueError, ts1.merge, ts2, how='right')
+
+    def testMergeEmpty(self):
+        from datetime import date
+        dates = [date(2014, 1, d) for d in (1, 2, 3)]
+        ts = self.timeseries('A', date=dates, data=[1, 2, 3])
+        empty = self.timeseries('B')
+        self.assertFalse(ts.merge(empty, how='inner'))
+        self.assertFalse(empty.merge(ts, how='inner'))
+        self.assertEqual(list(ts.merge(empty).dates()), dates)
+
+    def testMergeSameDates(self):
+        dates = np.arange(50)
+        series = [self.timeseries('S%s' % i, date=dates,
+                                  data=np.random.randn(50, 2))
+                  for i in range(10)]
+        ts = ts_merge(series)
+        self.assertEqual(ts.shape, (50, 20))
+        self.assertAlmostEqual(ts.values(),
+                               np.hstack([s.values() for s in series]))
+
+    def testDateIndex(self):
+        from datetime import date, timedelta
+        dates = [date(2014, 1, 1) + timedelta(days=i) for i in range(10)]
+        ts = self.timeseries('A', date=dates, data=range(10))
+        self.assertEqual(ts.keys().dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(ts.keys().nbytes, 80)
+        self.assertEqual(ts.start(), dates[0])
+        self.assertEqual(ts.end(), dates[-1])
+        self.assertEqual(list(ts.dates()), dates)
+        self.assertEqual(list(ts.dates(desc=True)), dates[::-1])
+        w = ts.window(dates[2], dates[5])
+        self.assertEqual(list(w.dates()), dates[2:6])
+        self.assertTrue(w.keys().base is not None)
+        btree = ts.asbtree()
+        self.assertEqual(btree.find_ge(dates[3]), 3)
+        self.assertEqual(btree.find_le(date(2015, 1, 1)), 9)
+        self.assertAlmostEqual(btree[dates[4]], np.array([4.]))
+        ts2 = self.timeseries('B', date=dates[3:], data=range(7))
+        ts3 = ts + ts2
+        self.assertEqual(ts3.keys().dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(list(ts3.dates()), dates)
+        self.assertEqual(list(ts.merge(ts2, all=False).dates()), dates[3:])
+        self.assertEqual(ts.rollmax(window=3).start(), dates[2])
+
+    def testDatetime64Index(self):
+        from datetime import date, datetime
+        dates = np.array(['2014-01-01', '2014-01-02', '2014-01-03'],
+                         dtype='datetime64[ns]')
+        ts = self.timeseries('A', date=dates, data=range(3))
+        self.assertEqual(ts.keys().dtype, np.dtype('datetime64[us]'))
+        self.assertEqual(ts.start(), datetime(2014, 1, 1))
+        self.assertEqual(ts.end(), datetime(2014, 1, 3))
+        self.assertEqual(len(ts.window(dates[1], dates[2])), 2)
+        ts = self.timeseries('B', date=dates.astype('datetime64[M]'),
+                             data=[1])
+        self.assertEqual(ts.keys().dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(ts.start(), date(2014, 1, 1))
+
+    def testTimezoneIndex(self):
+        from datetime import datetime, timedelta, timezone
+        tz = timezone(timedelta(hours=5))
+        dates = [datetime(2014, 1, 1, 12, tzinfo=tz),
+                 datetime(2014, 1, 2, 12, tzinfo=timezone.utc)]
+        ts = self.timeseries('A', date=dates, data=[1, 2])
+        self.assertEqual(list(ts.dates()), [datetime(2014, 1, 1, 7),
+                                            datetime(2014, 1, 2, 12)])
+        ts.insert(datetime(2014, 1, 2, 9, tzinfo=tz), [3])
+        self.assertEqual(ts.keys()[1], np.datetime64('2014-01-02T04:00'))
+
+    def testInsert(self):
+        from datetime import date
+        ts = self.timeseries('A')
+        ts.insert(date(2014, 1, 3), [3])
+        ts.insert(date(2014, 1, 1), [1])
+        ts.insert(date(2014, 1, 2), [2])
+        ts.insert(date(2014, 1, 2), [4])
+        self.assertEqual(ts.keys().dtype, np.dtype('datetime64[D]'))
+        self.assertEqual(list(ts.dates()), [date(2014, 1, 1),
+                                            date(2014, 1, 2),
+                                            date(2014, 1, 3)])
+        self.assertAlmostEqual(ts.values()[:, 0], np.array([1., 4., 3.]))
+        self.assertFalse(hasattr(ts, '_skl'))
+
+    def testAppend(self):
+        ts = self.timeseries('A')
+        for i in range(0, 200, 2):
+            ts.insert(i, [i])
+            if i == 98:
+                view = ts.values()
+        self.assertEqual(ts.shape, (100, 1))
+        self.assertEqual(ts.keys().tolist(), list(range(0, 200, 2)))
+        self.assertAlmostEqual(ts.values()[:, 0], np.arange(0., 200., 2))
+        self.assertEqual(view.shape, (50, 1))
+        self.assertTrue(ts.values().flags['C_CONTIGUOUS'])
+        ts.insert(21, [-1])
+        self.assertEqual(len(ts), 101)
+        self.assertEqual(ts.keys()[10:13].tolist(), [20, 21, 22])
+        self.assertAlmostEqual(ts.values()[10:13, 0],
+                               np.array([20., -1., 22.]))
+
+    def testInsertKeepsValues(self):
+        ts = self.timeseries('A')
+        for i in range(0, 20, 2):
+            ts.insert(i, [i])
+        keys, values = ts.keys(), ts.values()
+        ts.insert(5, [-1])
+        ts.insert(4, [-2])
+        self.assertEqual(keys.tolist(), list(range(0, 20, 2)))
+        self.assertAlmostEqual(values[:, 0], np.arange(0., 20., 2))
+        self.assertEqual(ts.keys()[2:5].tolist(), [4, 5, 6])
+        self.assertAlmostEqual(ts.values()[2:5, 0], np.array([-2., -1., 6.]))
+
+    def testInsertMany(self):
+        ts = self.timeseries('A', date=[1, 3, 5], data=[1, 3, 5])
+        ts.insert_many([6, 7, 8], [6, 7, 8])
+        self.assertEqual(ts.keys().tolist(), [1, 3, 5, 6, 7, 8])
+        ts.insert_many([4, 2, 3, 4], [4, 2, 30, 40])
+        self.assertEqual(ts.keys().tolist(), [1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertAlmostEqual(ts.values()[:, 0],
+                               np.array([1., 2., 30., 40., 5., 6., 7., 8.]))
+        ts.insert(9, [9])
+        self.assertEqual(ts.end(), 9)
+
+    def testViews(self):
+        ts = self.timeseries('A', date=range(10), data=np.arange(10.))
+        w = ts.window(2, 5)
+        self.assertEqual(w.keys().tolist(), [2, 3, 4, 5])
+        self.assertTrue(np.may_share_memory(w.values(), ts.values()))
+        self.assertTrue(w.isshared() and ts.isshared())
+        c = ts.clone(name='B')
+        self.assertEqual(c.name, 'B')
+        self.assertTrue(c.keys().base is ts.keys())
+        t = ts.tail(3)
+        self.assertEqual(t.keys().tolist(), [7, 8, 9])
+        logw = w.log()
+        self.assertTrue(np.may_share_memory(logw.keys(), ts.keys()))
+        self.assertFalse(logw.isshared())
+        # copy on write
+        w.insert(3, [-1])
+        w.insert(1, [-2])
+        self.assertAlmostEqual(ts.values()[:, 0], np.arange(10.))
+        self.assertEqual(w.keys().tolist(), [1, 2, 3, 4, 5])
+        self.assertAlmostEqual(w.values()[:, 0],
+                               np.array([-2., 2., -1., 4., 5.]))
+        ts.insert(4, [40])
+        ts.insert(10, [10])
+        self.assertAlmostEqual(t.values()[:, 0], np.array([7., 8., 9.]))
+        self.assertAlmostEqual(logw.values()[:, 0], np.log([2., 3., 4., 5.]))
+        self.assertEqual(ts.values()[4, 0], 40)
+        self.assertEqual(len(ts), 11)
+        self.assertTrue(ts.window(20, 30).keys() == ())
+
+    def testIndexCache(self):
+        ts = self.timeseries('A', date=range(10), data=np.arange(10.))
+        btree = ts.asbtree()
+        hash = ts.ashash()
+        self.assertTrue(ts.asbtree() is btree)
+        self.assertTrue(ts.ashash() is hash)
+        ts.insert(10, [10])
+        self.assertFalse(ts.asbtree() is btree)
+        self.assertEqual(ts.asbtree().find_ge(10), 10)
+        hash = ts.ashash()
+        hash[11] = np.array([11.])
+        self.assertFalse(ts.ashash() is hash)
+        self.assertFalse(11 in ts.ashash())
+
+    def testLocMany(self):
+        from datetime import date
+        ts = self.timeseries('A', date=[1, 3, 5, 7], data=[1, 3, 5, 7])
+        self.assertEqual(ts.loc_many([7, 0, 3, 4, 8]).tolist(),
+                         [3, -1, 1, -1, -1])
+        self.assertEqual(ts.loc_many([]).tolist(), [])
+        self.assertEqual(self.timeseries('B').loc_many([1]).tolist(), [-1])
+        dates = [date(2014, 1, d) for d in (1, 2, 6)]
+        ts = self.timeseries('C', date=dates, data=[1, 2, 3])
+        self.assertEqual(ts.loc_many([date(2014, 1, 6), date(2014, 1, 3),
+                                      date(2014, 1, 1)]).tolist(),
+                         [2, -1, 0])
+
+    def testSort(self):
+        from dynts.api.main import timeseries
+        dates = [3, 1, 2, 3, 1]
+        data = [30, 10, 20, 31, 11]
+        ts = timeseries('A', date=dates, data=data, sort=True)
+        self.assertEqual(ts.keys().tolist(), [1, 2, 3])
+        self.assertAlmostEqual(ts.values()[:, 0], np.array([11., 20., 31.]))
+        ts = timeseries('A', date=dates, data=data, sort=True, keep='first')
+        self.assertAlmostEqual(ts.values()[:, 0], np.array([10., 20., 30.]))
+        values = np.arange(5.)
+        ts = timeseries('A', date=range(5), data=values, sort=True)
+        self.assertTrue(ts.values().base is values)
+        self.assertRaises(ValueError, timeseries, 'A', date=dates,
+                          data=data, sort=True, keep='all')
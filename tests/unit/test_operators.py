@@ -0,0 +1,73 @@
+import numpy as np
+
+from dynts.utils import test
+from dynts.api.operators import join_index
+from dynts.api.timeseries import ts_bin_op
+
+
+class TestOperators(test.TestCase):
+
+    def testJoinIndex(self):
+        dates, i1, i2 = join_index([1, 3, 5, 6], [2, 3, 6, 8])
+        self.assertEqual(dates.tolist(), [1, 2, 3, 5, 6, 8])
+        self.assertEqual(i1.tolist(), [0, -1, 1, 2, 3, -1])
+        self.assertEqual(i2.tolist(), [-1, 0, 1, -1, 2, 3])
+        dates, i1, i2 = join_index([1, 3, 5, 6], [2, 3, 6, 8], all=False)
+        self.assertEqual(dates.tolist(), [3, 6])
+        self.assertEqual(i1.tolist(), [1, 3])
+        self.assertEqual(i2.tolist(), [1, 2])
+        dates = np.array([1, 2, 3])
+        self.assertEqual(join_index(dates, dates), (dates, None, None))
+        self.assertEqual(join_index(dates, [1, 2, 3])[1:], (None, None))
+        dates, i1, i2 = join_index([], [1, 2])
+        self.assertEqual(i1.tolist(), [-1, -1])
+
+    def testUnion(self):
+        ts1 = self.timeseries(date=[1, 3, 5, 6], data=[[1, 2], [3, 4],
+                                                       [5, 6], [7, 8]])
+        ts2 = self.timeseries(date=[2, 3, 6, 8], data=[[1, 1], [2, 2],
+                                                       [3, 3], [4, 4]])
+        ts = ts1 - ts2
+        self.assertEqual(ts.dates().tolist(), [1, 2, 3, 5, 6, 8])
+        values = ts.values()
+        self.assertEqual(np.isnan(values[:, 0]).tolist(),
+                         [True, True, False, True, False, True])
+        self.assertAlmostEqual(values[[2, 4]], np.array([[1., 2.],
+                                                         [4., 5.]]))
+
+    def testIntersection(self):
+        ts1 = self.timeseries(date=[1, 3, 5, 6], data=[1, 3, 5, 7])
+        ts2 = self.timeseries(date=[2, 3, 6, 8], data=[1, 2, 3, 4])
+        ts = ts_bin_op('sub', ts1, ts2, all=False)
+        self.assertEqual(ts.dates().tolist(), [3, 6])
+        self.assertAlmostEqual(ts.values(), np.array([[1.], [4.]]))
+        ts = ts_bin_op('mul', ts1, ts2, fill=0)
+        self.assertAlmostEqual(ts.values()[:, 0], np.array([0, 0, 6, 0,
+                                                            21, 0]))
+
+    def testSameDates(self):
+        ts1 = self.timeseries(date=range(50),
+                              data=np.random.randn(50, 2))
+        ts2 = ts1.clone(data=ts1.values()*2)
+        ts = ts1 + ts2
+        self.assertTrue(ts.dates() is ts1.dates())
+        self.assertAlmostEqual(ts.values(), ts1.values()*3)
+
+    def testScalar(self):
+        ts = self.timeseries(date=range(10),
+                             data=np.arange(20.).reshape(10, 2))
+        for result, expected in ((ts*2, ts.values()*2),
+                                 (ts_bin_op('mul', 2, ts), ts.values()*2),
+                                 (ts - 1, ts.values() - 1),
+                                 (ts_bin_op('sub', 1, ts), 1 - ts.values()),
+                                 (ts/4, ts.values()/4)):
+            self.assertTrue(result.dates() is ts.dates())
+            self.assertEqual(result.shape, (10, 2))
+            self.assertAlmostEqual(result.values(), expected)
+        values = ts.values()
+        result = ts_bin_op('mul', 3, ts, inplace=True)
+        self.assertTrue(result.values() is values)
+        self.assertAlmostEqual(values[:, 1], np.arange(1., 20., 2)*3)
+        result = ts_bin_op('div', ts, 0)
+        self.assertFalse(result.values() is values)
+        self.assertTrue(np.isinf(result.values()[1:]).all())
@@ -0,0 +1,173 @@
+import numpy as np
+
+from dynts import lib
+from dynts.api.roll import rollcolumns
+from dynts.lib import fallback
+from dynts.utils import test
+
+
+class TestRolling(test.TestCase):
+    functions = ('mean', 'median', 'min', 'max', 'sd', 'sharpe')
+
+    def data(self, N=60, K=4):
+        data = np.random.randn(N, K)
+        data[[3, 17, 18], 1] = np.nan
+        data[:, 2] = np.nan
+        return data
+
+    def testFallback2d(self):
+        data = self.data()
+        for func in self.functions:
+            rfunc = getattr(fallback, 'roll_%s' % func)
+            result = getattr(fallback, 'roll2d_%s' % func)(data, 10)
+            self.assertEqual(result.shape, (51, 4))
+            for k in range(4):
+                expected = np.array(list(rfunc(data[:, k], 10)))
+                self.assertTrue(np.allclose(result[:, k], expected,
+                                            equal_nan=True))
+        self.assertRaises(ValueError, fallback.roll2d_mean, data, 61)
+
+    @test.skipUnless(hasattr(lib, 'roll2d_mean'), 'Requires cts extension')
+    def testCts2d(self):
+        data = self.data()
+        for layout in (np.ascontiguousarray, np.asfortranarray):
+            for func in self.functions:
+                result = getattr(lib, 'roll2d_%s' % func)(layout(data), 10)
+                expected = getattr(fallback, 'roll2d_%s' % func)(data, 10)
+                self.assertTrue(np.allclose(result, expected,
+                                            equal_nan=True))
+                result = getattr(lib, 'roll_%s' % func)(data[:, 1], 10)
+                self.assertTrue(np.allclose(result, expected[:, 1],
+                                            equal_nan=True))
+
+    def testRollapply(self):
+        data = self.data()
+        ts = self.timeseries('A', date=range(60), data=data)
+        for func in self.functions:
+            for use_fallback in (False, True):
+                rts = ts.rollapply(func, window=5, fallback=use_fallback)
+                self.assertEqual(rts.shape, (56, 4))
+                self.assertEqual(rts.keys().tolist(), list(range(4, 60)))
+                expected = getattr(fallback, 'roll2d_%s' % func)(data, 5)
+                self.assertTrue(np.allclose(rts.values(), expected,
+                                            equal_nan=True))
+
+    def testThreads(self):
+        data = np.random.randn(100, 13)
+        ts = self.timeseries('A', date=range(100), data=data)
+        for func in self.functions:
+            for use_fallback in (False, True):
+                expected = ts.rollapply(func, window=10, fallback=use_fallback)
+                rts = ts.rollapply(func, window=10, fallback=use_fallback,
+                                   threads=4)
+                self.assertTrue(np.allclose(rts.values(), expected.values(),
+                                            equal_nan=True))
+        rts = ts.rollmean(window=10, threads=20)
+        self.assertEqual(rts.shape, (91, 13))
+        self.assertRaises(ValueError, rollcolumns, fallback.roll2d_mean,
+                          data, 101, 2)
+
+    def testSkiplist(self):
+        for use_fallback in (False, True):
+            sl = lib.make_skiplist(use_fallback=use_fallback)
+            values = []
+            for v in np.random.randn(300).round(1):
+                sl.insert(v)
+                values.append(v)
+            for v in values[::3]:
+                sl.remove(v)
+                values.remove(v)
+            values.sort()
+            self.assertEqual(len(sl), 200)
+            self.assertEqual(list(sl), values)
+            self.assertEqual([sl[i] for i in range(200)], values)
+            self.assertEqual(values[sl.rank(values[50])], values[50])
+            self.assertRaises(KeyError, sl.remove, -100.)
+            self.assertRaises(IndexError, lambda: sl[200])
+
+    def testInfinity(self):
+        data = np.array([[1., np.inf, 3., 4., -np.inf, np.inf, np.inf, 2.],
+                         [np.inf, 2., np.nan, np.inf, 1., -np.inf, 5., 6.]]).T
+        expected = {'median': [[np.inf, np.inf, 3.5, -np.inf, np.nan, np.inf,
+                                np.inf],
+                               [np.inf, 2., np.inf, np.inf, -np.inf,
+                                -np.inf, 5.5]],
+                    'max': [[np.inf, np.inf, 4., 4., np.inf, np.inf, np.inf],
+                            [np.inf, 2., np.inf, np.inf, 1., 5., 6.]],
+                    'min': [[1., 3., 3., -np.inf, -np.inf, np.inf, 2.],
+                            [2., 2., np.inf, 1., -np.inf, -np.inf, 5.]]}
+        for func, values in expected.items():
+            kernels = [getattr(fallback, 'roll2d_%s' % func)]
+            if hasattr(lib, 'roll2d_%s' % func):
+                kernels.append(getattr(lib, 'roll2d_%s' % func))
+            for kernel in kernels:
+                with np.errstate(invalid='ignore'):
+                    result = kernel(data, 2)
+                self.assertTrue(np.allclose(result, np.array(values).T,
+                                            equal_nan=True))
+        sl = lib.make_skiplist()
+        for v in (np.inf, 1., np.inf, -np.inf):
+            sl.insert(v)
+        sl.remove(np.inf)
+        self.assertEqual(list(sl), [-np.inf, 1., np.inf])
+        self.assertEqual(sl.rank(np.inf), 2)
+
+    def testMinMax(self):
+        data = self.data(N=97)
+        data[20:40, 3] = np.nan
+        data[50, 0] = data[51, 0]
+        for window in (1, 3, 16, 25, 97):
+            windows = [data[i:i+window] for i in range(98-window)]
+            for func, reduce in (('max', np.max), ('min', np.min)):
+                expected = np.array([[reduce(w[:, k][~np.isnan(w[:, k])])
+                                      if (~np.isnan(w[:, k])).any()
+                                      else np.nan for k in range(4)]
+                                     for w in windows])
+                kernels = [getattr(fallback, 'roll2d_%s' % func)]
+                if hasattr(lib, 'roll2d_%s' % func):
+                    kernels.append(getattr(lib, 'roll2d_%s' % func))
+                for kernel in kernels:
+                    result = kernel(data, window)
+                    self.assertTrue(np.allclose(result, expected,
+                                                equal_nan=True))
+
+    def testMoments(self):
+        data = 1e8 + np.random.randn(300, 3)
+        data[[10, 11, 150], 1] = np.nan
+        windows = [data[i:i+20] for i in range(281)]
+
+        def moments(reduce):
+            return np.array([[reduce(w[:, k][~np.isnan(w[:, k])])
+                              for k in range(3)] for w in windows])
+
+        sd = moments(lambda x: np.std(x, ddof=1))
+        sharpe = moments(lambda x: np.mean(x)/np.sqrt(np.mean(x*x)))
+        kernels = [fallback]
+        if hasattr(lib, 'roll2d_sd'):
+            kernels.append(lib)
+        for kernel in kernels:
+            result = kernel.roll2d_sd(data, 20, scale=4, ddof=1)
+            self.assertTrue(np.allclose(result, 2*sd, rtol=1e-6))
+            result = kernel.roll2d_sharpe(data, 20, scale=4)
+            self.assertTrue(np.allclose(result, 2*sharpe, rtol=1e-6))
+        ts = self.timeseries('A', date=range(300), data=data)
+        rts = ts.rollsd(window=20, scale=4, ddof=1)
+        self.assertTrue(np.allclose(rts.values(), 2*sd, rtol=1e-6))
+
+    def testMomentsOffset(self):
+        data = 1e9 + 1e-3*np.random.randn(2000, 2)
+        data[100:200, 1] = np.nan
+        data[150, 1] = 1e9
+        expected = np.array([np.std(data[i:i+50, 0]) for i in range(1951)])
+        result = fallback.roll2d_sd(data, 50)
+        self.assertTrue(np.allclose(result[:, 0], expected, rtol=1e-3,
+                                    atol=0))
+        # a single observation in the window
+        self.assertEqual(result[101:151, 1].tolist(), [0.]*50)
+        self.assertTrue(np.isnan(result[100, 1]))
+        if hasattr(lib, 'roll2d_sd'):
+            self.assertTrue(np.allclose(lib.roll2d_sd(data, 50), result,
+                                        rtol=1e-12, atol=0, equal_nan=True))
+            self.assertTrue(np.allclose(lib.roll2d_sharpe(data, 50),
+                                        fallback.roll2d_sharpe(data, 50),
+                                        rtol=1e-12, atol=0, equal_nan=True))